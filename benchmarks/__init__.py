@@ -0,0 +1 @@
+"""Benchmarks of entrogrammer, run with airspeed velocity (asv)."""
@@ -0,0 +1,63 @@
+"""Benchmarks of the classifiers."""
+
+from entrogrammer import classifier
+from .common import random_field
+
+
+class BinaryClassifier:
+    """Threshold classification."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6]]
+    param_names = ['ndim', 'n_cells']
+
+    def setup(self, ndim, n_cells):
+        self.data = random_field(n_cells, ndim)
+
+    def time_classify(self, ndim, n_cells):
+        classifier.BinaryClassifier(self.data, 0.5)
+
+    def peakmem_classify(self, ndim, n_cells):
+        classifier.BinaryClassifier(self.data, 0.5)
+
+
+class HistogramClassifier:
+    """Histogram binning."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6], [2, 8, 64]]
+    param_names = ['ndim', 'n_cells', 'n_class']
+
+    def setup(self, ndim, n_cells, n_class):
+        self.data = random_field(n_cells, ndim)
+
+    def time_classify(self, ndim, n_cells, n_class):
+        classifier.HistogramClassifier(self.data, bins=n_class)
+
+
+class JenksClassifier:
+    """Fisher-Jenks natural breaks, fitted on a sample of the data."""
+
+    params = [[10**4, 10**5, 10**6], [2, 8], [500, 2000]]
+    param_names = ['n_cells', 'n_class', 'sample_size']
+
+    def setup(self, n_cells, n_class, sample_size):
+        self.data = random_field(n_cells, 2)
+        # compile the Fisher-Jenks kernel outside of the timing
+        classifier.JenksClassifier(self.data[:10, :10], 2)
+
+    def time_classify(self, n_cells, n_class, sample_size):
+        classifier.JenksClassifier(self.data, n_class,
+                                   sample_size=sample_size, random_state=0)
+
+
+class JenksFit:
+    """Fisher-Jenks fit on all values, quadratic in the unique values."""
+
+    params = [[500, 1000, 2000], [2, 8]]
+    param_names = ['n_values', 'n_class']
+
+    def setup(self, n_values, n_class):
+        self.data = random_field(n_values, 1)
+        classifier.JenksClassifier(self.data[:10], 2)
+
+    def time_fit(self, n_values, n_class):
+        classifier.JenksClassifier(self.data, n_class)
@@ -0,0 +1,55 @@
+"""Benchmarks of the entrogram functions in core.py."""
+
+import numpy as np
+from entrogrammer import classifier, core, tools
+from .common import random_field
+
+
+class Entrogram:
+    """Entrogram over a log-spaced set of scales."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6], [2, 8], [None, -1]]
+    param_names = ['ndim', 'n_cells', 'n_class', 'n_jobs']
+
+    def setup(self, ndim, n_cells, n_class, n_jobs):
+        data = random_field(n_cells, ndim)
+        self.C = classifier.HistogramClassifier(data, bins=n_class)
+        self.C.encode()
+        tools.warmup(dtypes=(self.C.codes.dtype,), parallel=n_jobs is not None)
+
+    def time_calculate_entrogram(self, ndim, n_cells, n_class, n_jobs):
+        core.calculate_entrogram(self.C, n_scales=8, spacing='log',
+                                 n_jobs=n_jobs)
+
+
+class EntrogramSampled:
+    """Monte Carlo entrogram, cost should not grow with the data size."""
+
+    params = [[10**4, 10**5, 10**6], [200, 2000]]
+    param_names = ['n_cells', 'n_samples']
+
+    def setup(self, n_cells, n_samples):
+        data = random_field(n_cells, 3)
+        self.C = classifier.BinaryClassifier(data, 0.5)
+        self.C.encode()
+        core.sample_entrogram(self.C, scales=[2], n_samples=2)
+
+    def time_sample_entrogram(self, n_cells, n_samples):
+        core.sample_entrogram(self.C, scales=[2, 4, 8], n_samples=n_samples,
+                              random_state=0)
+
+
+class EntropicScale:
+    """Search for the entropic scale instead of the whole entrogram."""
+
+    params = [['scan', 'bisect']]
+    param_names = ['method']
+
+    def setup(self, method):
+        rng = np.random.default_rng(0)
+        self.C = classifier.BinaryClassifier(rng.random((300, 300)), 0.5)
+        self.C.encode()
+        core.calculate_entrogram(self.C, max_win=3)
+
+    def time_find_entropic_scale(self, method):
+        core.find_entropic_scale(self.C, method=method)
@@ -0,0 +1,65 @@
+"""Benchmarks of the entropy kernels in tools.py."""
+
+import numpy as np
+from entrogrammer import tools
+from .common import random_labels, shape_of
+
+
+class GlobalEntropy:
+    """Global entropy, from raw labels and from encoded codes."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6], [2, 8, 64]]
+    param_names = ['ndim', 'n_cells', 'n_class']
+
+    def setup(self, ndim, n_cells, n_class):
+        self.data = random_labels(n_cells, ndim, n_class)
+        self.codes, labels = tools.encode_labels(self.data)
+        self.n_class = len(labels)
+
+    def time_calculate_HG(self, ndim, n_cells, n_class):
+        tools.calculate_HG(self.data, 2)
+
+    def time_calculate_HG_codes(self, ndim, n_cells, n_class):
+        tools.calculate_HG(self.codes, 2, n_class=self.n_class)
+
+
+class LocalEntropy:
+    """Local entropy array at one scale, expected O(n * n_class)."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6], [2, 8, 64], [3, 9, 27]]
+    param_names = ['ndim', 'n_cells', 'n_class', 'win_size']
+
+    def setup(self, ndim, n_cells, n_class, win_size):
+        if win_size > shape_of(n_cells, ndim)[0]:
+            raise NotImplementedError('window larger than the data')
+        data = random_labels(n_cells, ndim, n_class)
+        self.codes, labels = tools.encode_labels(data)
+        self.n_class = len(labels)
+        # compile for these argument types outside of the timing
+        tools.calculate_HL(self.codes[(slice(0, win_size),) * ndim],
+                           win_size, 2, n_class=self.n_class)
+
+    def time_calculate_HL(self, ndim, n_cells, n_class, win_size):
+        tools.calculate_HL(self.codes, win_size, 2, n_class=self.n_class)
+
+    def peakmem_calculate_HL(self, ndim, n_cells, n_class, win_size):
+        tools.calculate_HL(self.codes, win_size, 2, n_class=self.n_class)
+
+
+class MeanLocalEntropy:
+    """Mean local entropy over several scales from one count table."""
+
+    params = [[1, 2, 3], [10**4, 10**5, 10**6], [2, 8]]
+    param_names = ['ndim', 'n_cells', 'n_class']
+
+    def setup(self, ndim, n_cells, n_class):
+        data = random_labels(n_cells, ndim, n_class)
+        self.codes, labels = tools.encode_labels(data)
+        self.n_class = len(labels)
+        n = shape_of(n_cells, ndim)[0]
+        self.scales = sorted(set(np.geomspace(2, n, 8).astype(int)))
+        tools.warmup(dtypes=(self.codes.dtype,), parallel=False)
+
+    def time_calculate_multiscale_HL(self, ndim, n_cells, n_class):
+        tools.calculate_multiscale_HL(self.codes, self.scales, 2,
+                                      n_class=self.n_class)
@@ -0,0 +1,20 @@
+"""Shared inputs for the benchmarks."""
+
+import numpy as np
+
+
+def shape_of(n_cells, ndim):
+    """Shape of a cube with about `n_cells` cells in `ndim` dimensions."""
+    return (int(round(n_cells ** (1 / ndim))),) * ndim
+
+
+def random_field(n_cells, ndim, seed=0):
+    """Continuous random field to be classified."""
+    rng = np.random.default_rng(seed)
+    return rng.random(shape_of(n_cells, ndim))
+
+
+def random_labels(n_cells, ndim, n_class, seed=0):
+    """Classified field with `n_class` labels."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, n_class, size=shape_of(n_cells, ndim))
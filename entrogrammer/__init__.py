@@ -1,6 +1,26 @@
-from . import classifier
-from . import core
-from . import plot
-from . import tools
+"""Entrogram calculator.
+
+The submodules are imported on first access (``entrogrammer.core`` etc.),
+so ``import entrogrammer`` does not pull in numba, scipy or matplotlib
+until they are needed.
+"""
+
+import importlib
 
 __version__ = "0.2.0"
+
+__all__ = ['cache', 'classifier', 'core', 'plot', 'tools']
+
+
+def __getattr__(name):
+    """Import the submodule `name` the first time it is accessed."""
+    if name in __all__:
+        module = importlib.import_module('.' + name, __name__)
+        globals()[name] = module  # later access skips __getattr__
+        return module
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    """List the submodules along with the loaded attributes."""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,211 @@
+"""Memoization of entropy results, in memory and on disk."""
+
+import collections
+import hashlib
+import os
+import tempfile
+import numpy as np
+from . import __version__
+
+# bytes of an array hashed at a time, so memory-mapped data is streamed
+HASH_BYTES = 2**26
+
+
+def content_hash(array):
+    """Hash the dtype, shape and contents of an array.
+
+    Uses `hashlib.blake2b`, reading the array a block of rows at a time so
+    that memory-mapped arrays are not loaded whole. Returns a hex string.
+    """
+    array = np.asanyarray(array)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(array.dtype).encode())
+    h.update(str(array.shape).encode())
+    if array.ndim == 0:
+        h.update(np.ascontiguousarray(array).tobytes())
+        return h.hexdigest()
+    row = max(array[0:1].nbytes, 1)
+    n_rows = max(HASH_BYTES // row, 1)
+    for i in range(0, array.shape[0], n_rows):
+        h.update(memoryview(np.ascontiguousarray(array[i:(i+n_rows)])))
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    """Least recently used cache of entropy results.
+
+    Results are kept in memory and, if a `directory` is given, also stored
+    there as `.npz` files so they persist across sessions and processes.
+    Each tier is bounded in size, the least recently used results are
+    evicted first. A result is a dict of arrays, keyed by :obj:`key`.
+
+    Used by the `cache` parameter of the functions in
+    :obj:`entrogrammer.core`.
+    """
+
+    def __init__(self, directory=None, max_bytes=2**30,
+                 memory_bytes=2**28):
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        directory: str, os.PathLike, optional
+            Directory to store the results in, created if missing. Results
+            are only kept in memory if not given.
+
+        max_bytes: int, optional
+            Size limit of the results stored in `directory`, 1 GiB by
+            default.
+
+        memory_bytes: int, optional
+            Size limit of the results kept in memory, 256 MiB by default.
+
+        """
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.memory_bytes = int(memory_bytes)
+        self._memory = collections.OrderedDict()
+        self._memory_size = 0
+
+    @staticmethod
+    def key(method, array, **params):
+        """Key of the result of `method` on `array` with `params`.
+
+        Combines the :obj:`content_hash` of the array with the package
+        version, the method name and the `repr` of the parameters, which
+        should be plain Python values. Results stored by another version of
+        the package are not found, and are evicted over time.
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(__version__.encode())
+        h.update(method.encode())
+        h.update(content_hash(array).encode())
+        h.update(repr(sorted(params.items())).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return the result stored under `key`, or None if there is none.
+
+        The arrays are copies, so they can be modified freely.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return {k: v.copy() for k, v in self._memory[key].items()}
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                result = {k: f[k] for k in f.files}
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # unreadable file, for instance one cut short, is dropped
+            self._remove(path)
+            return None
+        self._remember(key, result)
+        return {k: v.copy() for k, v in result.items()}
+
+    def put(self, key, result):
+        """Store the dict of arrays `result` under `key`.
+
+        Results larger than a tier's size limit are not stored in it.
+        """
+        result = {k: np.asarray(v) for k, v in result.items()}
+        self._remember(key, result, copy=True)
+        if self.directory is None:
+            return
+        if sum(v.nbytes for v in result.values()) > self.max_bytes:
+            return
+        # write to a temporary file first so readers never see half a file
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **result)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Remove every result from memory and from the directory."""
+        self._memory.clear()
+        self._memory_size = 0
+        for path, _, _ in self._files():
+            self._remove(path)
+
+    def _path(self, key):
+        """Path of the file storing the result under `key`."""
+        return os.path.join(self.directory, key + '.npz')
+
+    def _remember(self, key, result, copy=False):
+        """Keep `result` in memory, evicting the least recently used."""
+        size = sum(v.nbytes for v in result.values())
+        if key in self._memory:
+            self._memory_size -= sum(
+                v.nbytes for v in self._memory.pop(key).values())
+        if size > self.memory_bytes:
+            return
+        if copy:
+            result = {k: v.copy() for k, v in result.items()}
+        self._memory[key] = result
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= sum(v.nbytes for v in old.values())
+
+    def _files(self):
+        """Path, size and last use time of every stored result."""
+        files = []
+        if self.directory is None:
+            return files
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz') is False:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # removed by another process
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict(self):
+        """Remove the least recently used files above the size limit."""
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(f[1] for f in files)
+        for path, size, _ in files:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        """Remove a file that may already be gone."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_default = None
+
+
+def default_cache():
+    """The cache used when `cache=True` is passed to the core functions.
+
+    Results are stored in the directory given by the
+    `ENTROGRAMMER_CACHE_DIR` environment variable, or in
+    `~/.cache/entrogrammer`.
+    """
+    global _default
+    if _default is None:
+        directory = os.environ.get(
+            'ENTROGRAMMER_CACHE_DIR',
+            os.path.join(os.path.expanduser('~'), '.cache', 'entrogrammer'))
+        _default = ResultCache(directory)
+    return _default
@@ -1,8 +1,10 @@
 """Classes and methods for binning and classifying data."""
 
 import abc
-import xarray as xr
+import os
+import sys
 import numpy as np
+from . import tools
 
 
 class BaseClassifier(abc.ABC):
@@ -13,15 +15,31 @@ class BaseClassifier(abc.ABC):
     implemented.
     """
 
-    def __init__(self, data):
+    def __init__(self, data, dtype=None):
         """Read data.
 
         This method should handle pre-processing of data for all classifiers.
         Sub-classed classifiers should be able to pre-process and standardize
         data using methods defined here via `super().__init__(data)`
 
+        Parameters
+        ----------
+        data : numpy.ndarray, str
+            Input data array. Can be an `np.memmap` or the path to a `.npy`
+            file, which is then memory-mapped instead of being read into
+            memory, and the labels are written to a temporary memory-mapped
+            file. Dask arrays, or `xr.DataArray` backed by them, are kept
+            lazy and labelled block by block.
+
+        dtype : numpy.dtype, optional
+            Integer dtype of the classified labels. By default the smallest
+            unsigned integer type holding all labels is used (e.g. `uint8`
+            for up to 256 classes), which keeps the classified array and
+            the entropy kernels reading it small.
+
         """
         self.data = data
+        self.dtype = dtype
         self.classified = None  # init classified array as Nonetype
 
     @property
@@ -33,14 +51,49 @@ class BaseClassifier(abc.ABC):
     def data(self, data):
         """Type-check the input data array and create private variable."""
         # standardize data to a numpy.ndarray or raise an error
-        if type(data) is xr.core.dataarray.DataArray:
-            self._data = data.data  # convert to ndarray
-        elif type(data) is np.ndarray:
+        if _is_xarray(data):
+            self._data = data.data  # convert to ndarray, or dask array
+        elif tools.is_dask(data):
             self._data = data
+        elif isinstance(data, np.ndarray):
+            self._data = data  # includes np.memmap
+        elif (isinstance(data, (str, os.PathLike)) and
+              os.fspath(data).endswith('.npy')):
+            self._data = np.load(data, mmap_mode='r')
         else:
             raise TypeError('Invalid type for "data", expected a '
                             'numpy.ndarray but got: %s', type(data))
 
+    @property
+    def dtype(self):
+        """Return private dtype variable."""
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype):
+        """Type-check the label dtype and set it as a private variable."""
+        if dtype is None:
+            self._dtype = None
+            return
+        try:
+            dtype = np.dtype(dtype)
+        except Exception:
+            raise TypeError('Invalid "dtype", expected an integer dtype '
+                            'but got: %s' % str(dtype))
+        if np.issubdtype(dtype, np.integer) is False:
+            raise TypeError('Invalid "dtype", expected an integer dtype '
+                            'but got: %s' % str(dtype))
+        self._dtype = dtype
+
+    def label_dtype(self, max_label):
+        """Return the dtype used for labels from 0 to `max_label`."""
+        if self._dtype is None:
+            return np.min_scalar_type(max_label)
+        if max_label > np.iinfo(self._dtype).max:
+            raise ValueError('"dtype" %s cannot hold the label %d.'
+                             % (str(self._dtype), max_label))
+        return self._dtype
+
     @property
     def classified(self):
         """Return private classified array."""
@@ -50,6 +103,44 @@ class BaseClassifier(abc.ABC):
     def classified(self, classified):
         """Create private variable."""
         self._classified = classified
+        # any previous encoding no longer matches
+        self._codes = None
+        self._labels = None
+
+    def encode(self):
+        """Encode the classified labels as contiguous codes.
+
+        Maps the classified array onto the codes 0..K-1, where K is the
+        number of distinct labels, and keeps the code-to-label table in
+        `labels` (so `labels[codes]` is `classified`). The entropy kernels
+        count classes with an array of length K indexed by these codes
+        instead of sorting the labels in each window. This is done once,
+        on first access to `codes` or `labels`, and is redone whenever
+        `classified` is replaced.
+
+        """
+        if self._classified is None:
+            raise ValueError('`classify()` method must be run first.')
+        self._codes, self._labels = tools.encode_labels(self._classified)
+
+    @property
+    def codes(self):
+        """Return the classified array as contiguous codes 0..K-1."""
+        if self._codes is None:
+            self.encode()
+        return self._codes
+
+    @property
+    def labels(self):
+        """Return the label of each code."""
+        if self._labels is None:
+            self.encode()
+        return self._labels
+
+    @property
+    def n_class(self):
+        """Return the number of distinct labels in the classified array."""
+        return len(self.labels)
 
     @abc.abstractmethod
     def classify(self):
@@ -61,6 +152,57 @@ class BaseClassifier(abc.ABC):
 
         """
 
+    def fit(self, data=None):
+        """Learn the classification parameters.
+
+        Classifier classes should override this method. It learns the
+        thresholds, bins or breaks from `data` (the classifier's own data
+        by default) without labelling anything, so that
+        :obj:`transform` can then label other arrays cheaply. By default
+        there is nothing to learn.
+
+        """
+        return self
+
+    def transform(self, array, out=None):
+        """Label an array with the fitted classification parameters.
+
+        Classifier classes should override this method. Parameters learnt
+        by `fit()` are applied to `array`, for instance one of many
+        realizations of a field, without being learnt again. If given, the
+        labels are written to `out` (e.g. a preallocated or memory-mapped
+        array of the same shape) which is also returned. Classifiers that
+        only implement `classify()` cannot label other arrays.
+
+        """
+        raise NotImplementedError('%s does not implement transform(), only '
+                                  'classify().' % type(self).__name__)
+
+    def _map_blocks(self, array, out, max_label):
+        """Label a dask array lazily, one block at a time.
+
+        Returns the lazy labels, or stores them into `out` if given.
+        """
+        labels = array.map_blocks(self.transform,
+                                  dtype=self.label_dtype(max_label))
+        if out is None:
+            return labels
+        labels.store(out)
+        return out
+
+    def _label_output(self, array, out, max_label):
+        """Return `out`, or a new label array if it was not given."""
+        if out is None and isinstance(array, np.memmap):
+            # out-of-core data, keep the labels out of memory too
+            return tools.temp_memmap(np.shape(array),
+                                     self.label_dtype(max_label))
+        if out is None:
+            return np.empty(np.shape(array), dtype=self.label_dtype(max_label))
+        if np.shape(out) != np.shape(array):
+            raise ValueError('"out" has shape %s but the array has shape %s.'
+                             % (str(np.shape(out)), str(np.shape(array))))
+        return out
+
 
 class BinaryClassifier(BaseClassifier):
     """Simple binary classifier.
@@ -69,7 +211,7 @@ class BinaryClassifier(BaseClassifier):
 
     """
 
-    def __init__(self, data, threshold):
+    def __init__(self, data, threshold, dtype=None):
         """Initialize the BinaryClassifier.
 
         Parameters
@@ -81,8 +223,11 @@ class BinaryClassifier(BaseClassifier):
             Value below which data will be put into the "0" class.
             Data values at and above this threshold will go into the "1" class.
 
+        dtype : numpy.dtype, optional
+            Integer dtype of the labels, `uint8` by default.
+
         """
-        super().__init__(data)
+        super().__init__(data, dtype)
         self.threshold = threshold
         self.classify()
 
@@ -104,18 +249,24 @@ class BinaryClassifier(BaseClassifier):
 
     def classify(self, threshold=None):
         """Do the binary classification."""
-        # initialize the classified array
-        self.classified = np.zeros_like(self._data)
         # can overwrite threshold with a new one if supplied
         if threshold is not None:
             self.threshold = threshold
-        # need if tree to avoid making all values 0 or 1 depending on threshold
-        if self._threshold > 0:
-            self._classified[self._data < self._threshold] = 0
-            self._classified[self._data >= self._threshold] = 1
-        else:
-            self._classified[self._data >= self._threshold] = 1
-            self._classified[self._data < self._threshold] = 0
+        self.fit()
+        self.classified = self.transform(self._data)
+
+    def fit(self, data=None):
+        """Nothing to learn, the threshold is given."""
+        return self
+
+    def transform(self, array, out=None):
+        """Put values below the threshold in class 0, others in class 1."""
+        array = _as_array(array)
+        if tools.is_dask(array):
+            return self._map_blocks(array, out, 1)
+        out = self._label_output(array, out, 1)
+        np.greater_equal(array, self._threshold, out=out, casting='unsafe')
+        return out
 
 
 class JenksClassifier(BaseClassifier):
@@ -124,12 +275,15 @@ class JenksClassifier(BaseClassifier):
     This class is used to apply the Fisher-Jenks algorithm to compute natural
     breaks given some data. This classification scheme attempts to define a
     set of classes given some data values so that the variance within classes
-    is minimal, and the variance between different classes is maximal. To do
-    this in `entrogrammer`, the `jenkspy` python package
-    (https://github.com/mthh/jenkspy) is used.
+    is minimal, and the variance between different classes is maximal. The
+    breaks are computed by a compiled implementation in
+    :obj:`entrogrammer.tools.jenks_breaks`, optionally on a sample of the
+    data, and every value is then labelled with a vectorized search of the
+    breaks.
 
     """
-    def __init__(self, data, nb_class):
+    def __init__(self, data, nb_class, dtype=None, sample_size=None,
+                 sampling='random', random_state=None):
         """Initialize the JenksClassifier.
 
         Parameters
@@ -142,9 +296,35 @@ class JenksClassifier(BaseClassifier):
             float, this will be turned into an integer. Must be lower than the
             number of data points, and greater than 2.
 
+        dtype : numpy.dtype, optional
+            Integer dtype of the labels, the smallest unsigned integer type
+            holding `nb_class` labels by default.
+
+        sample_size : int, optional
+            Number of values to fit the breaks on. The fit is quadratic in
+            the number of unique values, so for large arrays of continuous
+            data a sample of a few thousand values is recommended. All of
+            the data is used by default, except for memory-mapped and
+            dask-backed data which are fit on `tools.JENKS_SAMPLE` random
+            values so that they are not read into memory.
+
+        sampling : str, optional
+            Either 'random' (default) or 'stratified', see
+            :obj:`entrogrammer.tools.jenks_breaks`. Stratified sampling
+            sorts all of the data in memory, so it is not available for
+            memory-mapped data.
+
+        random_state : int, numpy.random.Generator, optional
+            Seed or generator for the random sampling.
+
         """
-        super().__init__(data)
+        super().__init__(data, dtype)
         self.nb_class = nb_class
+        self.sample_size = sample_size
+        self.sampling = sampling
+        self.random_state = random_state
+        self.breaks = None
+        self.cuts = None
         self.classify()
 
     @property
@@ -164,7 +344,7 @@ class JenksClassifier(BaseClassifier):
             raise TypeError('Invalid type for "nb_class", expected an '
                             'int or float but got: %s' + type(nb_class))
         # value checking
-        data_len = len(self._data.ravel())
+        data_len = self._data.size
         if nb_class >= data_len:
             raise ValueError('"nb_class" must be lower than the number of '
                              'data points.')
@@ -173,25 +353,49 @@ class JenksClassifier(BaseClassifier):
 
     def classify(self, nb_class=None):
         """Do the jenks classification."""
-        # try to import jenkspy package
-        try:
-            from jenkspy import JenksNaturalBreaks
-        except Exception:
-            raise ImportError('`jenkspy` optional dependency not installed.')
+        self.fit(nb_class=nb_class)
+        self.classified = self.transform(self._data)
+
+    def fit(self, data=None, nb_class=None):
+        """Compute the natural breaks of `data` (own data by default)."""
         # set nb_class
         if nb_class is None:
             nb_class = self._nb_class
         # type-check nb_class
         if type(nb_class) is not int:
             raise ValueError('"nb_class" must be an integer')
-        # ravel the data array in-case it is multidimensional
-        data = np.ravel(self._data)
-        # initialize the jenks object
-        jnb = JenksNaturalBreaks(nb_class)
-        # do classification
-        jnb.fit(data)
-        # populate self._classified with the classified labels
-        self._classified = np.reshape(jnb.labels_, self._data.shape)
+        if data is None:
+            data = self._data
+        data = _as_array(data)
+        sample_size = self.sample_size
+        if tools.is_dask(data):
+            # fit on a bounded random sample, only that sample is computed
+            if sample_size is None:
+                sample_size = tools.JENKS_SAMPLE
+            data = tools.dask_sample(data, sample_size, self.random_state)
+        elif isinstance(data, np.memmap):
+            # out-of-core data, only a bounded random sample is read
+            if sample_size is None:
+                sample_size = tools.JENKS_SAMPLE
+            if (self.sampling != 'random') and (sample_size < data.size):
+                raise ValueError('Memory-mapped data can only be sampled '
+                                 'at random, sampling was: %s'
+                                 % str(self.sampling))
+        # fit the class limits
+        self.breaks, self.cuts = tools.jenks_breaks(
+            data, nb_class, sample_size, self.sampling, self.random_state)
+        return self
+
+    def transform(self, array, out=None):
+        """Label values by the thresholds between the fitted classes."""
+        array = _as_array(array)
+        if tools.is_dask(array):
+            return self._map_blocks(array, out, len(self.cuts))
+        out = self._label_output(array, out, len(self.cuts))
+        # block-wise so memory-mapped data is not read in all at once
+        for sl in tools.row_blocks(np.shape(array)):
+            out[sl] = np.searchsorted(self.cuts, array[sl], side='left')
+        return out
 
 
 class HistogramClassifier(BaseClassifier):
@@ -202,7 +406,7 @@ class HistogramClassifier(BaseClassifier):
 
     """
 
-    def __init__(self, data, bins=10, range=None):
+    def __init__(self, data, bins=10, range=None, dtype=None):
         """Initialize the HistogramClassifier.
 
         Parameters
@@ -216,10 +420,15 @@ class HistogramClassifier(BaseClassifier):
         range : (float, float), optional
             Lower and upper range of bins if specified.
 
+        dtype : numpy.dtype, optional
+            Integer dtype of the labels, the smallest unsigned integer type
+            holding the `bins + 2` labels from `np.digitize` by default.
+
         """
-        super().__init__(data)
+        super().__init__(data, dtype)
         self.bins = bins
         self.range = range
+        self.bin_edges = None
         self.classify()
 
     @property
@@ -255,14 +464,60 @@ class HistogramClassifier(BaseClassifier):
 
     def classify(self, bins=None, range=None):
         """Do histogram-based classification."""
+        self.fit(bins=bins, range=range)
+        self.classified = self.transform(self._data)
+
+    def fit(self, data=None, bins=None, range=None):
+        """Compute the bin edges from `data` (own data by default)."""
         # set up bins and range
         if bins is None:
             bins = self._bins
         if range is None:
             range = self._range
+        if data is None:
+            data = self._data
+        data = _as_array(data)
         # if range still none, set by data values
         if range is None:
-            range = (np.min(self._data), np.max(self._data))
-        # use np.histogram and np.digitize to do classification
-        _, bin_edges = np.histogram(self._data, bins, range)
-        self.classified = np.digitize(self._data, bin_edges)
+            range = (np.min(data), np.max(data))
+        if tools.is_dask(data):
+            # edges only depend on the range, which is a lazy reduction
+            range = tuple(float(r) for r in _dask_compute(*range))
+            data = np.zeros(0, dtype=data.dtype)
+        elif isinstance(data, np.memmap) and isinstance(bins, int):
+            # same for out-of-core data, which is not read again
+            data = np.zeros(0, dtype=data.dtype)
+        self.bin_edges = np.histogram_bin_edges(data, bins, range)
+        return self
+
+    def transform(self, array, out=None):
+        """Label values with their bin, same as `np.digitize`."""
+        array = _as_array(array)
+        if tools.is_dask(array):
+            return self._map_blocks(array, out, len(self.bin_edges))
+        out = self._label_output(array, out, len(self.bin_edges))
+        for sl in tools.row_blocks(np.shape(array)):
+            out[sl] = np.searchsorted(self.bin_edges, array[sl],
+                                      side='right')
+        return out
+
+
+def _is_xarray(array):
+    """Return True if `array` is an `xr.DataArray`, without importing it."""
+    xr = sys.modules.get('xarray')
+    return (xr is not None) and isinstance(array, xr.DataArray)
+
+
+def _as_array(array):
+    """Return the numpy array behind `array` (e.g. an `xr.DataArray`)."""
+    if _is_xarray(array):
+        return array.data
+    elif tools.is_dask(array) or isinstance(array, np.ndarray):
+        return array  # keep np.memmap and dask arrays as they are
+    return np.asarray(array)
+
+
+def _dask_compute(*args):
+    """Compute dask objects, imported here as dask is optional."""
+    import dask
+    return dask.compute(*args)
@@ -1,11 +1,14 @@
 """Core functions to call to calculate the entrogram/entropy values."""
 
+import os
+import time
 import numpy as np
+from . import cache as _cache
 from . import classifier
 from . import tools
 
 
-def global_entropy(Classifier, base=np.e):
+def global_entropy(Classifier, base=np.e, cache=None):
     """Calculate global entropy of some data.
 
     From an :obj:`entrogrammer.classifier.BaseClassifier`, calculate the
@@ -15,12 +18,22 @@ def global_entropy(Classifier, base=np.e):
     ----------
     Classifier: :obj:`entrogrammer.classifier.BaseClassifier`
         Any initialized class from `classifier.py` that has had the
-        `classify()` method run.
+        `classify()` method run. Can also be a
+        :obj:`entrogrammer.tools.ClassCounts`, for instance the merged
+        counts of several pieces of a dataset.
 
     base: int, float, optional
-        Logarithmic base for the entropy calculation. Same as the
-        `scipy.stats.entropy()` base parameter meaning it takes a default
-        value of `e` (natural logarithm) if not specified.
+        Logarithmic base for the entropy calculation, any positive value
+        other than 1. Same as the `scipy.stats.entropy()` base parameter
+        meaning it takes a default value of `e` (natural logarithm) if not
+        specified.
+
+    cache: bool, :obj:`entrogrammer.cache.ResultCache`, optional
+        Cache to look the result up in before computing it, and to store
+        it in afterwards. True uses
+        :obj:`entrogrammer.cache.default_cache`. Results are keyed by a
+        hash of the classified data and the base. Not used for dask-backed
+        data.
 
     Returns
     -------
@@ -28,19 +41,47 @@ def global_entropy(Classifier, base=np.e):
         The global entropy of the classified data array
 
     """
+    # type check base
+    base_checker(base)
+
+    # counts that were already gathered
+    if isinstance(Classifier, tools.ClassCounts):
+        return Classifier.entropy(base)
+
     # type check the classifier
     classify_checker(Classifier)
 
-    # type check base
-    base_checker(base)
+    # previously computed result
+    cache, key = cache_checker(cache, 'global_entropy', Classifier,
+                               base=float(base))
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit['HG'][()]
+
+    # lazy labels are counted per block and merged by a tree reduction
+    if tools.is_dask(Classifier.classified):
+        counts = tools.dask_class_counts(Classifier.classified).compute()
+        return counts.entropy(base)
+
+    # out-of-core labels are counted a block at a time
+    if isinstance(Classifier.classified, np.memmap):
+        counts = sum(tools.ClassCounts.from_array(Classifier.classified[sl])
+                     for sl in tools.row_blocks(Classifier.classified.shape))
+        HG = counts.entropy(base)
+    else:
+        # calculate the global entropy
+        HG = tools.calculate_HG(Classifier.codes, base,
+                                n_class=Classifier.n_class)
 
-    # calculate the global entropy
-    HG = tools.calculate_HG(Classifier.classified, base)
+    if key is not None:
+        cache.put(key, {'HG': HG})
 
     return HG
 
 
-def local_entropy(Classifier, scale, base=np.e):
+def local_entropy(Classifier, scale, base=np.e, step=1, out=None,
+                  chunk_size=None, dtype=np.float64, cache=None):
     """Calculate local entropy of some data at a particular scale.
 
     From an :obj:`entrogrammer.classifier.BaseClassifier`, calculate the
@@ -62,15 +103,54 @@ def local_entropy(Classifier, scale, base=np.e):
         N values of the tuple will be used.
 
     base: int, float, optional
-        Logarithmic base for the entropy calculation. Same as the
-        `scipy.stats.entropy()` base parameter meaning it takes a default
-        value of `e` (natural logarithm) if not specified.
+        Logarithmic base for the entropy calculation, any positive value
+        other than 1. Same as the `scipy.stats.entropy()` base parameter
+        meaning it takes a default value of `e` (natural logarithm) if not
+        specified.
+
+    step: int, tuple, str, optional
+        Distance between the starts of neighbouring windows, given like
+        `scale`. The default of 1 evaluates every window position, larger
+        steps skip positions to trade resolution for speed, and 'window'
+        steps by the window size so the windows tile the data without
+        overlapping.
+
+    out: numpy.ndarray, str, optional
+        float32 or float64 array of the same shape as the data the local
+        entropy is written to and returned, so repeated calls (for instance
+        over a sweep of scales) can reuse it. Can also be an `np.memmap`,
+        or the path of a `.npy` file to create as a memory-mapped output.
+
+    chunk_size: int, optional
+        Number of entries along the first axis processed at a time. Giving
+        it, a memory-mapped `out`, or classifying memory-mapped data,
+        computes the local entropy block by block (see
+        :obj:`entrogrammer.tools.calculate_HL_chunked`) so that peak
+        memory use does not depend on the size of the data.
+
+    dtype: numpy.dtype, optional
+        Type of the local entropy if `out` is not given (otherwise that of
+        `out` is used), either `np.float32` or `np.float64` (default).
+        `np.float32` halves the size of the output, window entropies are
+        still accumulated in double precision.
+
+    cache: bool, :obj:`entrogrammer.cache.ResultCache`, optional
+        Cache to look the result up in before computing it, and to store
+        it in afterwards. True uses
+        :obj:`entrogrammer.cache.default_cache`. Results are keyed by a
+        hash of the classified data, the scale, base, step and the dtype
+        of the result (that of `out` if given). Not used for dask-backed
+        data.
 
     Returns
     -------
     HL: numpy.ndarray
         The local entropy array of the classified data array for the
-        specified scale
+        specified scale. Cells not covered by any window (only possible
+        when `step` is larger than 1) are nan. For dask-backed data this
+        is a lazy dask array (see
+        :obj:`entrogrammer.tools.calculate_HL_dask`), unless `out` is
+        given.
 
     """
     # type check the classifier
@@ -80,35 +160,67 @@ def local_entropy(Classifier, scale, base=np.e):
     base_checker(base)
 
     # type check the scale
-    if type(scale) == int:
-        win_size = scale
-    elif type(scale) == tuple:
-        dims = np.shape(Classifier.classified)
-        # 1-D case
-        if len(dims) == 1:
-            if type(scale[0]) == int:
-                win_size = scale[0]  # if integer assignment is simple
-            else:
-                # if not try to assign from tuple
-                try:
-                    win_size = int(scale[0])
-                except Exception:
-                    raise TypeError('value in position 0 of scale was not '
-                                    ' an `int` / could not be made an `int`.')
-        # other dimensions not yet supported
-        else:
-            raise NotImplementedError('Only 1-D data currently supported.')
+    win_size = scale_checker(scale, np.shape(Classifier.classified))
+    step = step_checker(step, np.shape(Classifier.classified))
+
+    # type check the output
+    dtype = dtype_checker(dtype)
+    if isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(
+            out, mode='w+', dtype=dtype,
+            shape=np.shape(Classifier.classified))
+    elif out is not None:
+        out = tools.output_array(out, np.shape(Classifier.classified))
+
+    # lazy calculation with dask
+    if tools.is_dask(Classifier.classified):
+        HL = tools.calculate_HL_dask(Classifier.classified, win_size, base,
+                                     step=step, dtype=dtype)
+        if out is None:
+            return HL
+        HL.store(out)
+        return out
+
+    # previously computed result, keyed by the dtype actually returned
+    ndim = np.ndim(Classifier.classified)
+    if out is not None:
+        dtype = out.dtype
+    cache, key = cache_checker(
+        cache, 'local_entropy', Classifier,
+        scale=tuple(np.broadcast_to(win_size, ndim).tolist()),
+        base=float(base), step=step, dtype=str(dtype))
+    if key is not None:
+        hit = cache.get(key)
+        if (hit is not None) and (out is None):
+            return hit['HL']
+        elif hit is not None:
+            out[...] = hit['HL']
+            return out
+
+    # out-of-core calculation
+    chunked = ((chunk_size is not None) or isinstance(out, np.memmap) or
+               isinstance(Classifier.classified, np.memmap))
+    if chunked:
+        HL = tools.calculate_HL_chunked(Classifier.classified, win_size,
+                                        base, out=out,
+                                        chunk_size=chunk_size, step=step,
+                                        dtype=dtype)
     else:
-        raise TypeError('scale must be an `int` or `tuple`, '
-                        'was: %s', str(type(scale)))
+        # calculate local entropy
+        HL = tools.calculate_HL(Classifier.codes, win_size, base,
+                                n_class=Classifier.n_class, step=step,
+                                out=out, dtype=dtype)
 
-    # calculate local entropy
-    HL = tools.calculate_HL(Classifier.classified, win_size, base)
+    if key is not None:
+        cache.put(key, {'HL': HL})
 
     return HL
 
 
-def calculate_entrogram(Classifier, min_win=None, max_win=None, base=np.e):
+def calculate_entrogram(Classifier, min_win=None, max_win=None, base=np.e,
+                        n_jobs=None, scales=None, spacing='linear',
+                        n_scales=None, step=1, callback=None,
+                        cache=None):
     """Calculate the isotropic entrogram for some classified data.
 
     Calculates the entrogram (local entropy normalized by global entropy)
@@ -133,9 +245,63 @@ def calculate_entrogram(Classifier, min_win=None, max_win=None, base=np.e):
         data will be used as the maximum window size.
 
     base: int, float, optional
-        Logarithmic base for the entropy calculation. Same as the
-        `scipy.stats.entropy()` base parameter meaning it takes a default
-        value of `e` (natural logarithm) if not specified.
+        Logarithmic base for the entropy calculation, any positive value
+        other than 1. Same as the `scipy.stats.entropy()` base parameter
+        meaning it takes a default value of `e` (natural logarithm) if not
+        specified.
+
+    n_jobs: int, optional
+        Number of cores to spread the calculation over, at least 1, or -1
+        to use all of them. Scales are computed in parallel, or when there
+        are fewer scales than cores, tiles of each scale are. Runs on a
+        single core if left undefined. Not used for dask-backed data,
+        which is kept lazy and processed block by block by the dask
+        scheduler.
+
+    scales: list, optional
+        Explicit window sizes to evaluate, in which case `min_win`,
+        `max_win`, `spacing` and `n_scales` are ignored. The cost scales
+        with the number of window sizes evaluated.
+
+    spacing: str, optional
+        Either 'linear' (default) or 'log'. Only used with `n_scales`.
+
+    n_scales: int, optional
+        Number of window sizes to evaluate between `min_win` and
+        `max_win`, spaced linearly or geometrically according to
+        `spacing` and rounded to integers (duplicates are dropped). By
+        default every integer window size is evaluated.
+
+    step: int, tuple, str, optional
+        Distance between the starts of neighbouring windows, see
+        :obj:`local_entropy`. With 'window' each scale steps by its own
+        window size, so the cost of a scale falls with the window volume.
+        The local entropy is averaged over the cells covered by a window.
+
+    callback: callable, optional
+        Called with a dict once each stage of the calculation is done,
+        holding the `stage` name and its wall `time` in seconds. The
+        stages are 'check' (input checks), 'encode' (encoding the labels),
+        'HG' (global entropy), 'table' (class counts), 'compile' (numba
+        compilation) and then one 'scale' per window size, which also
+        reports its 'index', 'n_scales', 'win_size', the number of
+        'windows' evaluated, the 'bytes' allocated and 'HL' (see
+        :obj:`entrogrammer.tools.calculate_multiscale_HL`). Returning True
+        from the callback cancels the calculation, the entrogram of the
+        scales done so far is returned. Without a callback nothing is
+        timed. A result found in the `cache` is reported as a 'cache'
+        stage instead. For dask-backed data all scales are computed at
+        once and reported as a single 'compute' stage after 'check', so
+        there is no per-scale progress and the calculation cannot be
+        cancelled.
+
+    cache: bool, :obj:`entrogrammer.cache.ResultCache`, optional
+        Cache to look the result up in before computing it, and to store
+        it in afterwards. True uses
+        :obj:`entrogrammer.cache.default_cache`. Results are keyed by a
+        hash of the classified data, the window sizes, base and step.
+        Cancelled calculations are not stored. Not used for dask-backed
+        data.
 
     Returns
     -------
@@ -146,41 +312,223 @@ def calculate_entrogram(Classifier, min_win=None, max_win=None, base=np.e):
         Corresponding window sizes
 
     """
+    start = time.perf_counter()
     # type check the classifier
     classify_checker(Classifier)
 
     # type check base
     base_checker(base)
 
-    # quick check of window parameters
-    if min_win is None:
-        min_win = 2
-    else:
-        try:
-            min_win = int(min_win)
-        except Exception:
-            raise ValueError('min_win parameter was not int or float type.')
-
-    if max_win is None:
-        max_win = np.min(Classifier.classified.shape)
-    else:
-        try:
-            max_win = int(max_win)
-        except Exception:
-            raise ValueError('max_win parameter was not int or float type.')
+    # quick check of window and job parameters
+    win_size = window_checker(min_win, max_win,
+                              np.shape(Classifier.classified), scales,
+                              spacing, n_scales)
+    n_jobs = jobs_checker(n_jobs)
+    step = step_checker(step, np.shape(Classifier.classified))
+    if tools.emit_stage(callback, 'check', start) is True:
+        return [], []
+
+    # dask-backed data, every scale is computed in one lazy graph
+    if tools.is_dask(Classifier.classified):
+        import dask
+        import dask.array as da
+        counts = tools.dask_class_counts(Classifier.classified)
+        HL = [da.nanmean(tools.calculate_HL_dask(Classifier.classified, i,
+                                                 base, step=step))
+              for i in win_size]
+        if callback is not None:
+            start = time.perf_counter()
+        counts, HL = dask.compute(counts, HL)
+        HR = list(np.array(HL) / counts.entropy(base))
+        tools.emit_stage(callback, 'compute', start, n_scales=len(win_size))
+        return HR, win_size
+
+    # previously computed result
+    cache, key = cache_checker(cache, 'calculate_entrogram', Classifier,
+                               scales=win_size, base=float(base), step=step)
+    if key is not None:
+        start = time.perf_counter()
+        hit = cache.get(key)
+        if hit is not None:
+            tools.emit_stage(callback, 'cache', start)
+            return list(hit['HR']), win_size
+
+    # encode labels, timed separately as it is done once per classifier
+    if callback is not None:
+        start = time.perf_counter()
+        if tools.emit_stage(callback, 'encode', start,
+                            n_class=Classifier.n_class) is True:
+            return [], []
+        start = time.perf_counter()
 
     # do entrogram calculation
-    HR = []
-    HG = tools.calculate_HG(Classifier.classified, base)  # global entropy
-    for i in range(min_win, max_win+1):
-        HL = np.mean(tools.calculate_HL(Classifier.classified, i, base))
-        HR.append(HL / HG)
+    HG = tools.calculate_HG(Classifier.codes, base,
+                            n_class=Classifier.n_class)  # global entropy
+    if tools.emit_stage(callback, 'HG', start, HG=HG) is True:
+        return [], []
+    HL = tools.calculate_multiscale_HL(Classifier.codes, win_size, base,
+                                       n_jobs=n_jobs,
+                                       n_class=Classifier.n_class, step=step,
+                                       callback=callback)
+    HR = list(HL / HG)
+
+    if (key is not None) and (len(HR) == len(win_size)):
+        cache.put(key, {'HR': HR})
+
+    return HR, win_size[:len(HR)]
+
 
-    win_size = list(range(min_win, max_win+1))  # list of window size values
+def calculate_entrogram_batch(data, min_win=None, max_win=None, base=np.e,
+                              n_jobs=None, scales=None, spacing='linear',
+                              n_scales=None):
+    """Calculate the entrograms of a set of equal-shape realizations.
+
+    All realizations are handled by one compiled call, in parallel across
+    realizations, instead of one :obj:`calculate_entrogram` call each.
+
+    Parameters
+    ----------
+    data: list, numpy.ndarray
+        Either a list of :obj:`entrogrammer.classifier.BaseClassifier` that
+        have had the `classify()` method run, or an array of classified
+        data with the realizations along its first axis. All realizations
+        must have the same shape.
+
+    min_win: int, optional
+        Minimum window size, see :obj:`calculate_entrogram`.
+
+    max_win: int, optional
+        Maximum window size, see :obj:`calculate_entrogram`.
+
+    base: int, float, optional
+        Logarithmic base for the entropy calculation, see
+        :obj:`calculate_entrogram`.
+
+    n_jobs: int, optional
+        Number of cores to spread the realizations over, at least 1, or -1
+        to use all of them. Runs on a single core if left undefined.
+
+    scales, spacing, n_scales: optional
+        Window size schedule, see :obj:`calculate_entrogram`.
+
+    Returns
+    -------
+    HR: numpy.ndarray
+        Entrogram values, one row of shape `(n_scales,)` per realization.
+
+    win_size: list
+        Corresponding window sizes
+
+    """
+    # type check the data
+    if isinstance(data, (list, tuple)):
+        for C in data:
+            classify_checker(C)
+        shapes = set(np.shape(C.classified) for C in data)
+        if len(shapes) != 1:
+            raise ValueError('All realizations must have the same shape, '
+                             'got: %s' % str(shapes))
+        data = np.stack([C.classified for C in data])
+    elif isinstance(data, np.ndarray) is False:
+        raise TypeError('data must be a list of BaseClassifier or a '
+                        'numpy.ndarray, was: %s' % str(type(data)))
+    if (data.ndim < 2) or (data.ndim > 4):
+        raise TypeError('Realizations must be 1-D, 2-D or 3-D, '
+                        'got an array of shape %s' % str(data.shape))
+
+    # type check base
+    base_checker(base)
+
+    # quick check of window and job parameters
+    win_size = window_checker(min_win, max_win, data.shape[1:], scales,
+                              spacing, n_scales)
+    n_jobs = jobs_checker(n_jobs)
+
+    HR = tools.calculate_batch_HR(data, win_size, base, n_jobs=n_jobs)
 
     return HR, win_size
 
 
+def sample_entrogram(Classifier, min_win=None, max_win=None, base=np.e,
+                     scales=None, spacing='linear', n_scales=None,
+                     n_samples=1000, rtol=None, max_samples=None,
+                     random_state=None):
+    """Estimate the entrogram from randomly sampled windows.
+
+    Instead of averaging the local entropy over every window position, a
+    fixed number of windows is sampled at each scale. The estimate is
+    unbiased and its cost per scale does not grow with the size of the
+    data, which makes it practical for very large grids where the
+    entrogram is only needed to a given precision.
+
+    Parameters
+    ----------
+    Classifier: :obj:`entrogrammer.classifier.BaseClassifier`
+        Any initialized class from `classifier.py` that has had the
+        `classify()` method run.
+
+    min_win, max_win, scales, spacing, n_scales: optional
+        Window size schedule, see :obj:`calculate_entrogram`.
+
+    base: int, float, optional
+        Logarithmic base for the entropy calculation, see
+        :obj:`calculate_entrogram`.
+
+    n_samples: int, optional
+        Number of windows sampled at each scale, 1000 by default.
+
+    rtol: float, optional
+        Target relative standard error of each entrogram value. If given,
+        batches of `n_samples` windows are drawn until it is reached.
+
+    max_samples: int, optional
+        Limit on the number of windows sampled at a scale when `rtol` is
+        given, by default 100 times `n_samples`.
+
+    random_state: int, numpy.random.Generator, optional
+        Seed or generator used to draw the windows.
+
+    Returns
+    -------
+    HR: list
+        Estimated entrogram values (relative entropy values)
+
+    HR_se: list
+        Standard error of each entrogram value
+
+    win_size: list
+        Corresponding window sizes
+
+    """
+    # type check the classifier
+    classify_checker(Classifier)
+
+    # type check base
+    base_checker(base)
+
+    # quick check of window and sampling parameters
+    win_size = window_checker(min_win, max_win,
+                              np.shape(Classifier.classified), scales,
+                              spacing, n_scales)
+    n_samples = samples_checker(n_samples, 'n_samples')
+    if max_samples is not None:
+        max_samples = samples_checker(max_samples, 'max_samples')
+    if (rtol is not None) and (rtol <= 0):
+        raise ValueError('rtol must be positive.')
+
+    # global entropy is exact, local entropy is estimated
+    HG = tools.calculate_HG(Classifier.codes, base,
+                            n_class=Classifier.n_class)
+    HL, HL_se, _ = tools.calculate_sampled_HL(
+        Classifier.codes, win_size, base, n_samples=n_samples,
+        rtol=rtol, max_samples=max_samples, random_state=random_state,
+        n_class=Classifier.n_class)
+    HR = list(HL / HG)
+    HR_se = list(HL_se / HG)
+
+    return HR, HR_se, win_size
+
+
 def calculate_entropic_scale(HR, win_size):
     """Calculate the entropic scale given the HR and window size information.
 
@@ -207,11 +555,140 @@ def calculate_entropic_scale(HR, win_size):
     return entropic_scale
 
 
+def find_entropic_scale(Classifier, min_win=None, max_win=None, base=np.e,
+                        method='scan', tol=1):
+    """Find the entropic scale without calculating the whole entrogram.
+
+    Evaluates the relative entropy at as few scales as possible to find
+    the first window size where it reaches 1, see
+    :obj:`calculate_entropic_scale`.
+
+    Parameters
+    ----------
+    Classifier: :obj:`entrogrammer.classifier.BaseClassifier`
+        Any initialized class from `classifier.py` that has had the
+        `classify()` method run.
+
+    min_win: int, optional
+        Minimum window size, see :obj:`calculate_entrogram`.
+
+    max_win: int, optional
+        Maximum window size, see :obj:`calculate_entrogram`.
+
+    base: int, float, optional
+        Logarithmic base for the entropy calculation, see
+        :obj:`calculate_entrogram`.
+
+    method: str, optional
+        'scan' (default) evaluates the window sizes in increasing order and
+        stops at the first one where the relative entropy reaches 1, which
+        gives the same result as :obj:`calculate_entropic_scale`.
+        'bisect' doubles the step between evaluated window sizes until the
+        relative entropy reaches 1 and then bisects the last interval, so
+        only O(log(max_win)) scales are evaluated. This assumes the
+        entrogram increases with the window size.
+
+    tol: int, optional
+        Width of the window size interval at which the 'bisect' search
+        stops, the upper end of that interval is returned. Default is 1,
+        giving the exact entropic scale of a monotonic entrogram.
+
+    Returns
+    -------
+    entropic_scale: int
+        Window size corresponding to the entropic scale.
+
+    """
+    # type check the classifier
+    classify_checker(Classifier)
+
+    # type check base
+    base_checker(base)
+
+    # quick check of window parameters
+    win_size = window_checker(min_win, max_win,
+                              np.shape(Classifier.classified))
+    if len(win_size) == 0:
+        raise ValueError('max_win must not be smaller than min_win.')
+    if method not in ('scan', 'bisect'):
+        raise ValueError('method must be "scan" or "bisect", was: %s'
+                         % str(method))
+    try:
+        tol = max(int(tol), 1)
+    except Exception:
+        raise ValueError('tol parameter was not int or float type.')
+
+    # the count table is shared by all the scales evaluated
+    HG = tools.calculate_HG(Classifier.codes, base,
+                            n_class=Classifier.n_class)
+    table = tools.cumulative_counts(Classifier.codes, Classifier.n_class)
+    shape = np.shape(Classifier.classified)
+
+    def HR(i):
+        """Relative entropy at window size i."""
+        return tools.mean_HL(table, shape, i, base) / HG
+
+    lo, hi = win_size[0], win_size[-1]
+    if method == 'scan':
+        for i in win_size:
+            if HR(i) >= 1.0:
+                return i
+        raise ValueError('Entropic scale not reached by max_win=%d.' % hi)
+
+    # gallop up until the relative entropy reaches 1
+    if HR(lo) >= 1.0:
+        return lo
+    step = 1
+    while True:
+        upper = min(lo + step, hi)
+        if HR(upper) >= 1.0:
+            break
+        if upper == hi:
+            raise ValueError('Entropic scale not reached by max_win=%d.'
+                             % hi)
+        lo = upper
+        step *= 2
+    # then bisect, HR(lo) < 1 <= HR(upper)
+    while upper - lo > tol:
+        mid = (lo + upper) // 2
+        if HR(mid) >= 1.0:
+            upper = mid
+        else:
+            lo = mid
+    return upper
+
+
 def base_checker(base):
-    """Type-checks the log-base input 'base'."""
-    if ((int(base) == 2) or (int(base) == 10) or (base == np.e)) is False:
+    """Type-checks the log-base input 'base'.
+
+    Any positive base other than 1 is valid, the kernels work in nats and
+    apply the base as a final division.
+    """
+    try:
+        valid = (float(base) > 0) and (float(base) != 1)
+    except Exception:
+        valid = False
+    if valid is False:
         raise TypeError('base, if specified, must be valid log base, '
-                        'was: %s', str(type(base)))
+                        'was: %s', str(base))
+
+
+def cache_checker(cache, method, Classifier, **params):
+    """Type-checks the cache input and returns it with the result key.
+
+    The key is None when no cache is used, or when the classified data are
+    a dask array, which would have to be computed to be hashed.
+    """
+    if (cache is None) or (cache is False):
+        return None, None
+    elif cache is True:
+        cache = _cache.default_cache()
+    elif isinstance(cache, _cache.ResultCache) is False:
+        raise TypeError('cache must be a `bool` or a `ResultCache`, '
+                        'was: %s' % str(type(cache)))
+    if tools.is_dask(Classifier.classified):
+        return cache, None
+    return cache, cache.key(method, Classifier.classified, **params)
 
 
 def classify_checker(Classifier):
@@ -221,3 +698,153 @@ def classify_checker(Classifier):
                         'was: %s', str(type(Classifier)))
     elif Classifier.classified is None:
         raise ValueError('`Classifier.classify()` method must be run first.')
+
+
+def scale_checker(scale, dims):
+    """Type-checks the scale input and returns the window size.
+
+    An `int` is used as an isotropic window size. A tuple gives the window
+    size for each dimension, padded with its last value if it is shorter
+    than the number of dimensions and truncated if it is longer. Window
+    sizes must be at least 1.
+    """
+    if type(scale) == int:
+        if scale < 1:
+            raise ValueError('scale must be at least 1, was: %d' % scale)
+        return scale
+    elif type(scale) != tuple:
+        raise TypeError('scale must be an `int` or `tuple`, '
+                        'was: %s', str(type(scale)))
+    win_size = []
+    for i in range(len(dims)):
+        val = scale[min(i, len(scale) - 1)]
+        if type(val) == int:
+            win_size.append(val)  # if integer assignment is simple
+        else:
+            # if not try to assign from tuple
+            try:
+                win_size.append(int(val))
+            except Exception:
+                raise TypeError('value in position %d of scale was not '
+                                'an `int` / could not be made an `int`.'
+                                % min(i, len(scale) - 1))
+    if any(w < 1 for w in win_size):
+        raise ValueError('scale must be at least 1, was: %s'
+                         % str(tuple(win_size)))
+    return tuple(win_size)
+
+
+def step_checker(step, dims):
+    """Type-checks the step input and returns the window step.
+
+    Takes the same values as the scale (see :obj:`scale_checker`), which
+    must be positive, or the string 'window' for non-overlapping windows.
+    """
+    if isinstance(step, str):
+        if step != 'window':
+            raise ValueError("step must be an `int`, `tuple` or 'window', "
+                             "was: %s" % step)
+        return step
+    try:
+        step = scale_checker(step, dims)
+    except TypeError:
+        raise TypeError("step must be an `int`, `tuple` or 'window', "
+                        "was: %s" % str(type(step)))
+    except ValueError:
+        raise ValueError('step must be at least 1.')
+    return step
+
+
+def dtype_checker(dtype):
+    """Type-checks the dtype of the local entropy.
+
+    Must be float32 or float64, the float types the kernels write.
+    """
+    try:
+        dtype = np.dtype(dtype)
+    except Exception:
+        raise TypeError('dtype must be a float type, was: %s' % str(dtype))
+    if dtype not in tools.FLOAT_DTYPES:
+        raise TypeError('dtype must be a float type, was: %s' % str(dtype))
+    return dtype
+
+
+def window_checker(min_win, max_win, dims, scales=None, spacing='linear',
+                   n_scales=None):
+    """Type-checks the window parameters and returns the window sizes.
+
+    Explicit `scales` are used as given. Otherwise every integer from
+    `min_win` to `max_win` is returned, or if `n_scales` is set, that many
+    sizes spaced linearly or geometrically (`spacing='log'`) between them,
+    rounded to integers with duplicates dropped. Window sizes below 1 raise
+    a ValueError.
+    """
+    if scales is not None:
+        try:
+            win_size = [int(s) for s in scales]
+        except Exception:
+            raise ValueError('scales must be a sequence of int values.')
+        if any(s < 1 for s in win_size):
+            raise ValueError('scales must be positive.')
+        return win_size
+
+    if min_win is None:
+        min_win = 2
+    else:
+        try:
+            min_win = int(min_win)
+        except Exception:
+            raise ValueError('min_win parameter was not int or float type.')
+        if min_win < 1:
+            raise ValueError('min_win must be positive.')
+
+    if max_win is None:
+        max_win = int(np.min(dims))
+    else:
+        try:
+            max_win = int(max_win)
+        except Exception:
+            raise ValueError('max_win parameter was not int or float type.')
+
+    if spacing not in ('linear', 'log'):
+        raise ValueError('spacing must be "linear" or "log", was: %s'
+                         % str(spacing))
+    if (n_scales is None) and (spacing == 'linear'):
+        return list(range(min_win, max_win+1))  # list of window size values
+    if n_scales is None:
+        raise ValueError('n_scales must be given for log spacing.')
+    try:
+        n_scales = int(n_scales)
+    except Exception:
+        raise ValueError('n_scales parameter was not int type.')
+    if max_win < 1:
+        raise ValueError('max_win must be positive.')
+    if spacing == 'log':
+        win_size = np.geomspace(min_win, max_win, n_scales)
+    else:
+        win_size = np.linspace(min_win, max_win, n_scales)
+    return [int(s) for s in np.unique(np.round(win_size))]
+
+
+def samples_checker(n_samples, name):
+    """Type-checks a number of samples, which must be at least 2."""
+    try:
+        n_samples = int(n_samples)
+    except Exception:
+        raise ValueError('%s parameter was not int type.' % name)
+    if n_samples < 2:
+        raise ValueError('%s must be at least 2.' % name)
+    return n_samples
+
+
+def jobs_checker(n_jobs):
+    """Type-checks the n_jobs parameter, which is -1 (all cores) or >= 1."""
+    if n_jobs is None:
+        return n_jobs
+    try:
+        n_jobs = int(n_jobs)
+    except Exception:
+        raise ValueError('n_jobs parameter was not int type.')
+    if (n_jobs < 1) and (n_jobs != -1):
+        raise ValueError('n_jobs must be -1 or at least 1, was: %d' % n_jobs)
+    return n_jobs
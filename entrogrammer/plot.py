@@ -1,11 +1,11 @@
 """Plotting odds and ends, included for users' convenience."""
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def plot_entrogram(win_size, HR, labels=True):
     """Make simple plot of entrogram given window sizes and HR."""
+    import matplotlib.pyplot as plt  # only loaded when plotting
     ax1 = plt.gca()  # make plot on current axis if possible
     # plot line and scatter points
     ax1.plot(win_size, HR)
@@ -19,6 +19,7 @@ def plot_entrogram(win_size, HR, labels=True):
 
 def plot_HL(HL, win_size=None, labels=True):
     """Visual map-like plot of the local entropy values."""
+    import matplotlib.pyplot as plt  # only loaded when plotting
     # reshape if HL is just 1-D or pretending to be 2-D
     if len(np.shape(HL)) < 2:
         HL = np.vstack((HL, HL))
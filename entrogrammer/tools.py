@@ -1,11 +1,31 @@
 """Helper functions for misc. calculations."""
 
+import contextlib
+import sys
+import tempfile
+import time
 import numpy as np
-from scipy.stats import entropy
-from numba import njit
+import numba
+from numba import njit, prange
 
+# dtypes of the label codes the kernels are compiled for by warmup()
+LABEL_DTYPES = (np.uint8, np.uint16)
 
-def calculate_HG(data, base):
+# float types of the local entropy the kernels can write
+FLOAT_DTYPES = (np.float32, np.float64)
+
+# number of cells per block in the out-of-core functions
+CHUNK_CELLS = 2**24
+
+# largest window volume for which plogp_table is built (32 MB of float64)
+PLOGP_MAX = 2**22
+
+# default number of values Jenks breaks of out-of-core (memory-mapped or
+# dask-backed) data are fit on
+JENKS_SAMPLE = 10**5
+
+
+def calculate_HG(data, base, n_class=None):
     """Calculate global entropy.
 
     Internal function to calculate global entropy. Assumes data has been
@@ -19,22 +39,105 @@ def calculate_HG(data, base):
     base: int, float
         Logarithmic base for the entropy calculation.
 
+    n_class: int, optional
+        If given, `data` holds the codes 0..n_class-1 (see
+        :obj:`entrogrammer.classifier.BaseClassifier.encode`) and the
+        classes are counted with a single `np.bincount` pass.
+
     Returns
     -------
     HG: float
         The global entropy of the data array
 
     """
-    # get probabilities
-    n_vals = len(data.flat)  # total number of values
-    # get number of each unique (classified) value in the array
-    _, unique_counts = np.unique(data, return_counts=True)
-    probs = unique_counts / n_vals  # get probabilities
+    if n_class is None:
+        return ClassCounts.from_array(data).entropy(base)
+    from scipy.stats import entropy  # slow to import, load on first use
+    # get number of each class in the array, O(n) as no sort is needed
+    unique_counts = np.bincount(np.ravel(data), minlength=n_class)
+    probs = unique_counts / np.size(data)  # get probabilities
     HG = entropy(probs, base=base)  # get global entropy, this is returned
     return HG
 
 
-def calculate_HL(data, win_size, base):
+class ClassCounts:
+    """Mergeable per-class counts of classified data.
+
+    Holds the number of cells of each label. Counts of separate pieces of
+    a dataset (files, chunks, processes) can be added together, so the
+    global entropy of the whole dataset can be computed without ever
+    loading it at once::
+
+        counts = sum(ClassCounts.from_array(np.load(f)) for f in files)
+        HG = counts.entropy(2)
+
+    """
+
+    def __init__(self, labels, counts):
+        """Initialize the ClassCounts.
+
+        Parameters
+        ----------
+        labels : numpy.ndarray
+            Sorted unique labels.
+
+        counts : numpy.ndarray
+            Number of cells with each label.
+
+        """
+        self.labels = np.asarray(labels)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_array(cls, data):
+        """Count the labels of a classified array.
+
+        Integer labels spanning fewer than 65536 values are counted in
+        O(n) by :obj:`count_labels` without any temporary array, other
+        labels fall back to `np.unique`.
+        """
+        data = np.asarray(data)
+        lo = label_offset(data)
+        if lo is not None:
+            counts = count_labels(data.ravel(), lo,
+                                  int(data.max()) - lo + 1)
+            present = counts > 0
+            labels = (np.flatnonzero(present) + lo).astype(data.dtype)
+            return cls(labels, counts[present])
+        labels, counts = np.unique(data, return_counts=True)
+        return cls(labels, counts)
+
+    @property
+    def n(self):
+        """Return the total number of cells counted."""
+        return int(np.sum(self.counts))
+
+    def entropy(self, base=np.e):
+        """Return the entropy of the counted labels."""
+        from scipy.stats import entropy
+        probs = self.counts / self.n  # get probabilities
+        return entropy(probs, base=base)
+
+    def __add__(self, other):
+        """Merge the counts of two pieces of data."""
+        if isinstance(other, ClassCounts) is False:
+            return NotImplemented
+        labels, inverse = np.unique(
+            np.concatenate((self.labels, other.labels)), return_inverse=True)
+        counts = np.zeros(len(labels), dtype=np.int64)
+        np.add.at(counts, inverse, np.concatenate((self.counts,
+                                                   other.counts)))
+        return ClassCounts(labels, counts)
+
+    def __radd__(self, other):
+        """Allow the built-in `sum()` starting from 0."""
+        if isinstance(other, int) and (other == 0):
+            return self
+        return self.__add__(other)
+
+
+def calculate_HL(data, win_size, base, table=None, n_class=None, step=1,
+                 out=None, dtype=np.float64):
     """Calculate local entropy of some data at a particular scale.
 
     Internal function to calculate averaged local entropy. Assumes data has
@@ -57,100 +160,1631 @@ def calculate_HL(data, win_size, base):
     base: int, float
         Logarithmic base for the entropy calculation.
 
+    table: numpy.ndarray, optional
+        Per-class cumulative counts of the data from
+        :obj:`cumulative_counts`. Can be passed in to reuse it across
+        scales, in which case window counts are looked up from it instead
+        of being updated by a sliding histogram.
+
+    n_class: int, optional
+        If given, `data` already holds the codes 0..n_class-1 (see
+        :obj:`entrogrammer.classifier.BaseClassifier.encode`) and is not
+        encoded again.
+
+    step: int, tuple, str, optional
+        Distance between the starts of neighbouring windows, per dimension
+        if a tuple. The default of 1 slides the window over every
+        position, 'window' uses the window size so that the windows tile
+        the data without overlap. Cells not covered by any window are nan.
+
+    out: numpy.ndarray, optional
+        float32 or float64 array of the same shape as `data` to write the
+        local entropy to, so that repeated calls can reuse it. Every cell is
+        overwritten.
+
+    dtype: numpy.dtype, optional
+        Type of the returned array when `out` is not given, `np.float32`
+        or `np.float64` (default). Window entropies are always accumulated
+        in float64, `np.float32` only halves the size of the output.
+
     Returns
     -------
     HL: numpy.ndarray
         The local entropy vector of the classified data array for the
-        specified scale (same shape as `data` input parameter)
+        specified scale (same shape as `data` input parameter), `out` if
+        it was given.
 
     """
-    # init arrays for entropy and counts (because numba is bad for this)
-    h = np.zeros_like(data).astype('float')
-    cnt = np.zeros_like(data)
+    # array for the averaged entropy values, every cell is written
+    h = output_array(out, np.shape(data), dtype)
+    # isotropic window if only a single size was given
+    if isinstance(win_size, tuple) is False:
+        win_size = (int(win_size),) * len(np.shape(data))
+    step = tuple(int(i) for i in _step_array(step, win_size))
+
+    # entropy terms for the window volume, in nats
+    plogp = plogp_table(int(np.prod(win_size)))
 
     # 1-D solution
-    if ((len(np.shape(data)) == 1) and (base == 2)):
-        return HL_1D_base2(data, win_size, h, cnt)
-    elif ((len(np.shape(data)) == 1) and (base == 10)):
-        return HL_1D_base10(data, win_size, h, cnt)
-    elif ((len(np.shape(data)) == 1) and (base == np.e)):
-        return HL_1D_basee(data, win_size, h, cnt)
-    else:
-        pass
+    if len(np.shape(data)) == 1:
+        if table is not None:
+            h = HL_1D_table(table, win_size[0], step[0], plogp, h)
+        else:
+            codes, n_class = _codes(data, n_class)
+            h = HL_1D_sliding(codes, n_class, win_size[0], step[0], plogp,
+                              h)
 
     # 2-D solution
-    if ((len(np.shape(data)) == 2) and (base == 2)):
-        raise NotImplementedError('2-D not implemented yet.')
-    elif ((len(np.shape(data)) == 2) and (base == 10)):
-        raise NotImplementedError('2-D not implemented yet.')
-    elif ((len(np.shape(data)) == 2) and (base == np.e)):
-        raise NotImplementedError('2-D not implemented yet.')
-    else:
-        pass
+    elif len(np.shape(data)) == 2:
+        if table is not None:
+            h = HL_2D_table(table, win_size[0], win_size[1], step[0],
+                            step[1], plogp, h)
+        else:
+            codes, n_class = _codes(data, n_class)
+            h = HL_2D_sliding(codes, n_class, win_size[0], win_size[1],
+                              step[0], step[1], plogp, h)
 
     # 3-D solution
-    if ((len(np.shape(data)) == 3) and (base == 2)):
-        raise NotImplementedError('3-D not implemented yet.')
-    elif ((len(np.shape(data)) == 3) and (base == 10)):
-        raise NotImplementedError('3-D not implemented yet.')
-    elif ((len(np.shape(data)) == 3) and (base == np.e)):
-        raise NotImplementedError('3-D not implemented yet.')
+    elif len(np.shape(data)) == 3:
+        if table is None:
+            table = cumulative_counts(*_codes(data, n_class))
+        h = HL_3D_table(table, win_size[0], win_size[1], win_size[2],
+                        step[0], step[1], step[2], plogp, h)
+
     else:
         raise TypeError('Dimensions beyond 3 are not supported.')
 
+    # change of log base is a single division
+    h /= np.log(base)
+    return h
+
 
-@njit
-def HL_1D_base2(data, win_size, h, cnt):
-    """Do the 1-D local entropy calculation with base 2."""
-    num_slides = len(data) - win_size + 1
-    for i in range(num_slides):
-        cnt[i:(i+win_size)] += 1  # count the cells visited by this window
-        unique_counts = np_unique_impl(data[i:(i+win_size)])
-        probs = []
-        for k in unique_counts:
-            probs.append(k / win_size)
-        # do entropy calculation
-        for j in range(len(probs)):
-            h[i:(i+win_size)] += -1 * probs[j] * np.log2(probs[j])
-    h = h / cnt  # make average by dividing by number of visits
+def output_array(out, shape, dtype=np.float64):
+    """Check the `out` array of a local entropy, or allocate it.
+
+    `out` must have the same `shape` as the data and one of the
+    `FLOAT_DTYPES`. If it is None an uninitialized array of `dtype` is
+    returned.
+    """
+    if out is None:
+        if np.dtype(dtype) not in FLOAT_DTYPES:
+            raise TypeError('dtype must be a float type, was: %s'
+                            % str(dtype))
+        return np.empty(shape, dtype=dtype)
+    if np.shape(out) != tuple(shape):
+        raise ValueError('"out" has shape %s but the data has shape %s.'
+                         % (str(np.shape(out)), str(tuple(shape))))
+    if out.dtype not in FLOAT_DTYPES:
+        raise TypeError('"out" must have a float dtype, was: %s'
+                        % str(out.dtype))
+    return out
+
+
+def calculate_HL_chunked(data, win_size, base, out=None, chunk_size=None,
+                         step=1, dtype=np.float64):
+    """Calculate local entropy one block of the data at a time.
+
+    Out-of-core version of :obj:`calculate_HL` for data that does not fit
+    in memory, such as an `np.memmap`. The data is split into blocks of
+    `chunk_size` entries along its first axis. Each block is read with a
+    halo of `win_size-1` entries on either side, which holds every window
+    covering the cells of the block, so the result is the same as for the
+    whole array. Only one block is in memory at a time.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        An ndarray with the classified data, typically memory-mapped.
+
+    win_size: int, tuple
+        Window size, see :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    out: numpy.ndarray, optional
+        Float array of the same shape as `data` the local entropy is
+        written to, for instance an `np.memmap`. Allocated in memory if
+        not given.
+
+    chunk_size: int, optional
+        Number of entries along the first axis in each block. By default
+        blocks hold about `CHUNK_CELLS` cells.
+
+    step: int, tuple, str, optional
+        Step between windows, see :obj:`calculate_HL`.
+
+    dtype: numpy.dtype, optional
+        Float type of `out` when it is allocated here, see
+        :obj:`calculate_HL`.
+
+    Returns
+    -------
+    HL: numpy.ndarray
+        `out`, holding the local entropy of the data.
+
+    """
+    shape = np.shape(data)
+    if len(shape) > 3:
+        raise TypeError('Dimensions beyond 3 are not supported.')
+    if isinstance(win_size, tuple) is False:
+        win_size = (int(win_size),) * len(shape)
+    step = tuple(int(i) for i in _step_array(step, win_size))
+    out = output_array(out, shape, dtype)
+    for sl in row_blocks(shape, chunk_size):
+        # block plus halo, starting on a window position
+        lo = (max(sl.start - win_size[0] + 1, 0) // step[0]) * step[0]
+        hi = min(sl.stop + win_size[0] - 1, shape[0])
+        block = np.asarray(data[lo:hi])
+        h = calculate_HL(block, win_size, base, step=step, dtype=out.dtype)
+        out[sl] = h[(sl.start - lo):(sl.stop - lo)]
+    return out
+
+
+def row_blocks(shape, chunk_size=None):
+    """Slices splitting the first axis of an array of `shape` into blocks.
+
+    Blocks are `chunk_size` entries long, or hold about `CHUNK_CELLS`
+    cells if it is not given.
+    """
+    if len(shape) == 0:
+        return [Ellipsis]
+    if chunk_size is None:
+        row = int(np.prod(shape[1:]))
+        chunk_size = CHUNK_CELLS // max(row, 1)
+    chunk_size = max(int(chunk_size), 1)
+    return [slice(i, min(i + chunk_size, shape[0]))
+            for i in range(0, shape[0], chunk_size)]
+
+
+def temp_memmap(shape, dtype):
+    """Memory-mapped array backed by a temporary file.
+
+    The file is removed once the array is no longer referenced.
+    """
+    return np.memmap(tempfile.TemporaryFile(), dtype=dtype, mode='w+',
+                     shape=shape)
+
+
+def calculate_HL_dask(data, win_size, base, step=1, dtype=np.float64):
+    """Calculate local entropy of a dask array lazily.
+
+    Dask version of :obj:`calculate_HL`, each block is computed with
+    `map_overlap` and a halo of `win_size-1` cells from its neighbours on
+    every side, so the result matches that of the whole array and blocks
+    are processed in parallel by the dask scheduler.
+
+    Parameters
+    ----------
+    data: dask.array.Array
+        Classified data.
+
+    win_size: int, tuple
+        Window size, see :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    step: int, tuple, str, optional
+        Step between windows, see :obj:`calculate_HL`.
+
+    dtype: numpy.dtype, optional
+        Float type of the local entropy, see :obj:`calculate_HL`.
+
+    Returns
+    -------
+    HL: dask.array.Array
+        The local entropy of the data, not computed yet.
+
+    """
+    import dask.array as da
+    from dask.array.overlap import ensure_minimum_chunksize
+    if data.ndim > 3:
+        raise TypeError('Dimensions beyond 3 are not supported.')
+    dtype = output_array(None, (0,), dtype).dtype
+    if isinstance(win_size, tuple) is False:
+        win_size = (int(win_size),) * data.ndim
+    step = tuple(int(i) for i in _step_array(step, win_size))
+    if np.any(np.array(data.shape) < np.array(win_size)):
+        # window larger than the data, nothing visited
+        return da.full(data.shape, np.nan, chunks=data.chunks,
+                       dtype=dtype)
+    depth = tuple(w - 1 for w in win_size)
+    # blocks at least as large as the halo, so dask does not rechunk
+    data = data.rechunk(tuple(ensure_minimum_chunksize(max(d, 1), c)
+                              for d, c in zip(depth, data.chunks)))
+    starts = tuple(tuple(np.cumsum((0,) + c[:-1])) for c in data.chunks)
+    return data.map_overlap(_block_HL, depth=depth, boundary='none',
+                            dtype=dtype, meta=np.array((), dtype=dtype),
+                            win_size=win_size, base=base, step=step,
+                            starts=starts, halo=depth, float_dtype=dtype)
+
+
+def _block_HL(block, win_size, base, step, starts, halo,
+              float_dtype=np.float64, block_id=None):
+    """Local entropy of one block of a dask array with its halo."""
+    h = np.full(np.shape(block), np.nan, dtype=float_dtype)
+    # windows start on multiples of the step in the whole array
+    crop = []
+    for d in range(np.ndim(block)):
+        lo = max(starts[d][block_id[d]] - halo[d], 0)
+        crop.append(slice((-lo) % step[d], None))
+    crop = tuple(crop)
+    h[crop] = calculate_HL(block[crop], win_size, base, step=step,
+                           dtype=float_dtype)
     return h
 
 
-@njit
+def dask_class_counts(data, split_every=8):
+    """Per-class counts of a dask array, merged by a tree reduction.
+
+    Each block is counted by :obj:`ClassCounts.from_array` and the counts
+    are added in groups of `split_every` until one is left. Returns a
+    `dask.delayed` object to be computed.
+    """
+    import dask
+    parts = [dask.delayed(ClassCounts.from_array)(b)
+             for b in data.to_delayed().ravel()]
+    while len(parts) > 1:
+        parts = [dask.delayed(sum)(parts[i:(i+split_every)])
+                 for i in range(0, len(parts), split_every)]
+    return parts[0]
+
+
+def dask_sample(data, sample_size=None, random_state=None):
+    """Random values of a dask array, all of them if no size is given.
+
+    Without a `sample_size` the whole array is computed into memory.
+    """
+    if (sample_size is None) or (sample_size >= data.size):
+        return np.asarray(data.compute()).ravel()
+    rng = np.random.default_rng(random_state)
+    idx = np.sort(rng.integers(0, data.size, sample_size))
+    return np.asarray(data.ravel()[idx].compute())
+
+
+def is_dask(array):
+    """Return True if `array` is a dask array, without importing dask."""
+    da = sys.modules.get('dask.array')
+    return (da is not None) and isinstance(array, da.Array)
+
+
+def calculate_multiscale_HL(data, scales, base, n_jobs=None, n_class=None,
+                            step=1, callback=None):
+    """Calculate the mean local entropy at several scales.
+
+    Internal function for the entrogram. The per-class cumulative counts
+    of the data are built once and shared by every scale, so the counting
+    work is not repeated for each window size. Assumes data has been
+    type-checked in :obj:`entrogrammer.core.calculate_entrogram()`.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        An ndarray with the classified data.
+
+    scales: list
+        Window sizes (`int` or `tuple`) to evaluate, see
+        :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    n_jobs: int, optional
+        Number of threads to use, -1 uses all available cores. When there
+        are at least as many scales as threads the scales are spread over
+        the threads, otherwise each scale is split into tiles of window
+        positions. The count table is shared by all threads, not copied.
+        Runs serially by default.
+
+    n_class: int, optional
+        If given, `data` already holds the codes 0..n_class-1 and is not
+        encoded again, see :obj:`calculate_HL`.
+
+    step: int, tuple, str, optional
+        Step between windows, see :obj:`calculate_HL`. With 'window' each
+        scale uses its own window size as the step.
+
+    callback: callable, optional
+        Called with a dict describing each stage once it is done, see
+        :obj:`emit_stage`. The stages are 'table' (counting), 'compile'
+        (numba compilation, or loading it from the cache) and one 'scale'
+        per window size, which also has the keys 'index', 'n_scales',
+        'win_size', 'windows' (number of window positions evaluated),
+        'bytes' (memory allocated by the kernel) and 'HL'. Scales are
+        then evaluated one at a time, and if the callback returns True
+        the remaining ones are skipped.
+
+    Returns
+    -------
+    HL: numpy.ndarray
+        The mean local entropy of the data at each scale, averaged over
+        the cells covered by at least one window. Shorter than `scales`
+        if the callback cancelled the calculation.
+
+    """
+    start = time.perf_counter()
+    table = cumulative_counts(*_codes(data, n_class))
+    emit_stage(callback, 'table', start, bytes=table.nbytes)
+    shape = np.array(np.shape(data), dtype=np.int64)
+    base = float(base)  # one compiled specialization for any base
+    wins = np.array([_window_array(s, len(shape)) for s in scales],
+                    dtype=np.int64).reshape((len(scales), len(shape)))
+    steps = np.array([_step_array(step, w) for w in wins],
+                     dtype=np.int64).reshape(wins.shape)
+
+    # instrumented evaluation, one scale at a time
+    if callback is not None:
+        return _multiscale_HL_stages(table, shape, wins, steps, base,
+                                     n_jobs, callback)
+
+    # serial evaluation
+    if (n_jobs is None) or (n_jobs == 1):
+        HL = np.zeros(len(scales))
+        for i in range(len(scales)):
+            HL[i] = mean_HL_serial(table, shape, wins[i], steps[i], base)
+        return HL
+
+    # parallel evaluation
+    with _threads(n_jobs) as n_jobs:
+        if len(scales) >= n_jobs:
+            HL = mean_HL_scales(table, shape, wins, steps, base)
+        else:
+            HL = np.zeros(len(scales))
+            for i in range(len(scales)):
+                HL[i] = mean_HL_tiles(table, shape, wins[i], steps[i],
+                                      base, 4 * n_jobs)
+    return HL
+
+
+def _multiscale_HL_stages(table, shape, wins, steps, base, n_jobs, callback):
+    """Mean local entropy scale by scale, reporting each to `callback`."""
+    start = time.perf_counter()
+    if len(wins) > 0:
+        args = (table, shape, wins[0], steps[0], base)
+        mean_HL_serial.compile(tuple(numba.typeof(a) for a in args))
+        if (n_jobs is not None) and (n_jobs != 1):
+            args = args + (1,)
+            mean_HL_tiles.compile(tuple(numba.typeof(a) for a in args))
+    emit_stage(callback, 'compile', start)
+    HL = np.zeros(len(wins))
+    with _threads(n_jobs) as n_jobs:
+        for i in range(len(wins)):
+            start = time.perf_counter()
+            if n_jobs == 1:
+                HL[i] = mean_HL_serial(table, shape, wins[i], steps[i], base)
+            else:
+                HL[i] = mean_HL_tiles(table, shape, wins[i], steps[i], base,
+                                      4 * n_jobs)
+            num = [n_windows(n, w, s)
+                   for n, w, s in zip(shape, wins[i], steps[i])]
+            stop = emit_stage(callback, 'scale', start, index=i,
+                              n_scales=len(wins), win_size=tuple(wins[i]),
+                              windows=int(np.prod(num)),
+                              bytes=_scale_bytes(table, num, wins[i], n_jobs),
+                              HL=HL[i])
+            if stop is True:
+                return HL[:(i+1)]
+    return HL
+
+
+def _scale_bytes(table, num, win, n_jobs):
+    """Memory allocated by the mean kernels for one scale.
+
+    Each call of a kernel allocates the window counts and, in 2-D and 3-D,
+    the per-axis weights, and the entropy terms are tabulated once.
+    """
+    vol = int(np.prod(win))
+    per_call = table.shape[-1] + (sum(num) if len(num) > 1 else 0)
+    n_calls = 1 if n_jobs == 1 else max(1, min(4 * n_jobs, num[0]))
+    n_terms = vol + 1 if vol <= PLOGP_MAX else 0
+    return 8 * (per_call * n_calls + n_terms)
+
+
+def emit_stage(callback, stage, start, **info):
+    """Report a finished stage of a calculation to `callback`.
+
+    The callback is given a dict with the `stage` name, its wall `time`
+    in seconds since `start` (from `time.perf_counter()`) and any other
+    `info`. Returns what the callback returned, True asks the calculation
+    to stop. Does nothing if there is no callback.
+    """
+    if callback is None:
+        return None
+    info['stage'] = stage
+    info['time'] = time.perf_counter() - start
+    return callback(info)
+
+
+def calculate_batch_HR(data, scales, base, n_jobs=None, n_class=None):
+    """Calculate the entrograms of a stack of realizations.
+
+    Internal function for :obj:`entrogrammer.core.calculate_entrogram_batch`.
+    The realizations are encoded together and each one's count table,
+    global entropy and mean local entropy at every scale are computed in a
+    single compiled pass, parallel across the realizations.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        Classified data with the realizations along the first axis.
+
+    scales: list
+        Window sizes (`int` or `tuple`) to evaluate, see
+        :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    n_jobs: int, optional
+        Number of threads to use, -1 uses all available cores. Runs
+        serially by default.
+
+    n_class: int, optional
+        If given, `data` already holds the codes 0..n_class-1 and is not
+        encoded again, see :obj:`calculate_HL`.
+
+    Returns
+    -------
+    HR: numpy.ndarray
+        Array of shape `(n_realizations, len(scales))` with the entrogram
+        of each realization.
+
+    """
+    codes, n_class = _codes(data, n_class)
+    ndim = np.ndim(codes) - 1
+    wins = np.array([_window_array(s, ndim) for s in scales],
+                    dtype=np.int64).reshape((len(scales), ndim))
+    proto = _table_proto(np.size(codes) // max(len(codes), 1))
+    with _threads(n_jobs):
+        HR = batch_HR(codes, n_class, proto, wins, np.ones_like(wins),
+                      float(base))
+    return HR
+
+
+def calculate_sampled_HL(data, scales, base, n_samples=1000, rtol=None,
+                         max_samples=None, random_state=None, n_class=None):
+    """Estimate the mean local entropy at several scales by sampling.
+
+    Internal function for :obj:`entrogrammer.core.sample_entrogram`. A
+    cell is drawn uniformly, then one of the windows covering it, so the
+    entropy of the window is an unbiased sample of the mean local entropy
+    of :obj:`calculate_HL`. Only the sampled windows are counted, the cost
+    of a scale depends on the number of samples and the window volume but
+    not on the size of the data.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        An ndarray with the classified data.
+
+    scales: list
+        Window sizes (`int` or `tuple`) to evaluate, see
+        :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    n_samples: int, optional
+        Number of windows sampled per scale, or per round when `rtol` is
+        given.
+
+    rtol: float, optional
+        Target relative standard error of the estimate. Further rounds of
+        `n_samples` windows are drawn until it is reached or
+        `max_samples` windows have been sampled.
+
+    max_samples: int, optional
+        Largest number of windows sampled per scale when `rtol` is given,
+        defaults to 100 rounds.
+
+    random_state: int, numpy.random.Generator, optional
+        Seed or generator for the window positions.
+
+    n_class: int, optional
+        If given, `data` already holds the codes 0..n_class-1 and is not
+        encoded again, see :obj:`calculate_HL`.
+
+    Returns
+    -------
+    HL: numpy.ndarray
+        Estimated mean local entropy at each scale.
+
+    HL_se: numpy.ndarray
+        Standard error of each estimate.
+
+    n: numpy.ndarray
+        Number of windows sampled at each scale.
+
+    """
+    codes, n_class = _codes(data, n_class)
+    ndim = np.ndim(codes)
+    if ndim > 3:
+        raise TypeError('Dimensions beyond 3 are not supported.')
+    # kernel works on 3-D arrays, pad with leading unit axes
+    codes = np.reshape(codes, (1,) * (3 - ndim) + np.shape(codes))
+    shape = np.array(np.shape(codes), dtype=np.int64)
+    rng = np.random.default_rng(random_state)
+    if max_samples is None:
+        max_samples = 100 * n_samples
+    HL = np.full(len(scales), np.nan)
+    HL_se = np.full(len(scales), np.nan)
+    n = np.zeros(len(scales), dtype=np.int64)
+    for i, scale in enumerate(scales):
+        win = np.ones(3, dtype=np.int64)
+        win[3-ndim:] = _window_array(scale, ndim)
+        if np.any(shape < win):
+            continue  # window larger than the data, nothing visited
+        plogp = plogp_table(int(np.prod(win)))
+        samples = np.zeros(0)
+        while True:
+            starts = sample_starts(rng, shape, win, n_samples)
+            samples = np.concatenate(
+                (samples, sample_HL(codes, n_class, win, starts, plogp)))
+            HL[i] = np.mean(samples)
+            if len(samples) > 1:
+                HL_se[i] = np.std(samples, ddof=1) / np.sqrt(len(samples))
+            else:
+                HL_se[i] = np.inf
+            if rtol is None:
+                break
+            elif (HL_se[i] <= rtol * HL[i]) or (len(samples) >= max_samples):
+                break
+        n[i] = len(samples)
+    # change of log base is a single division
+    return HL / np.log(base), HL_se / np.log(base), n
+
+
+def sample_starts(rng, shape, win, n_samples):
+    """Draw window starts covering uniformly drawn cells.
+
+    Along each axis a cell is drawn uniformly and then one of the windows
+    covering it, also uniformly, which weights the windows as the cells
+    average them in :obj:`calculate_HL`.
+    """
+    starts = np.zeros((n_samples, len(shape)), dtype=np.int64)
+    for d in range(len(shape)):
+        cell = rng.integers(0, shape[d], size=n_samples)
+        lo = np.maximum(cell - win[d] + 1, 0)
+        hi = np.minimum(cell, shape[d] - win[d])
+        starts[:, d] = lo + (rng.random(n_samples) *
+                             (hi - lo + 1)).astype(np.int64)
+    return starts
+
+
+def warmup(dtypes=LABEL_DTYPES, parallel=True):
+    """Compile the kernels ahead of the first real calculation.
+
+    The kernels are compiled the first time they see a new combination of
+    argument types, which takes several seconds. This runs them once on
+    tiny 1-D, 2-D and 3-D inputs for each label dtype, so that a worker
+    can pay that cost at startup. The compiled kernels are also cached on
+    disk (`cache=True`), so later processes load them instead of compiling
+    again, until the package is updated.
+
+    Parameters
+    ----------
+    dtypes: tuple, optional
+        Dtypes of the label codes to compile for. By default those given
+        by :obj:`encode_labels` for up to 65536 classes.
+
+    parallel: bool, optional
+        Whether to also compile the parallel kernels used with `n_jobs`.
+
+    """
+    for dtype in dtypes:
+        for ndim in (1, 2, 3):
+            codes = np.zeros((3,) * ndim, dtype=dtype)
+            codes.flat[0] = 1
+            table = cumulative_counts(codes, 2)
+            calculate_HL(codes, 2, np.e, n_class=2)
+            calculate_HL(codes, 2, np.e, table=table)
+            calculate_multiscale_HL(codes, [2], np.e, n_class=2)
+            if parallel:
+                shape = np.array(codes.shape, dtype=np.int64)
+                wins = np.full((1, ndim), 2, dtype=np.int64)
+                mean_HL_scales(table, shape, wins, np.ones_like(wins), np.e)
+                mean_HL_tiles(table, shape, wins[0], wins[0] // 2, np.e, 2)
+                calculate_batch_HR(np.stack([codes, codes]), [2], np.e,
+                                   n_class=2)
+            calculate_sampled_HL(codes, [2], np.e, n_samples=2, n_class=2)
+            encode_labels(codes + 1)
+    jenks_breaks(np.linspace(0, 1, 4), 2)
+
+
+@contextlib.contextmanager
+def _threads(n_jobs):
+    """Run the numba parallel regions inside with `n_jobs` threads.
+
+    Yields the number of threads actually used, -1 or more than available
+    means all of them. Other values must be at least 1.
+    """
+    if n_jobs is None:
+        n_jobs = 1
+    max_threads = numba.config.NUMBA_NUM_THREADS
+    if n_jobs == -1:
+        n_jobs = max_threads
+    n_jobs = min(n_jobs, max_threads)
+    prev_threads = numba.get_num_threads()
+    # scales and tiles differ a lot in cost, so hand them out one at a time
+    # (the chunk size can only be set from numba 0.57 on)
+    chunked = hasattr(numba, 'set_parallel_chunksize')
+    if chunked:
+        prev_chunk = numba.set_parallel_chunksize(1)
+    numba.set_num_threads(n_jobs)
+    try:
+        yield n_jobs
+    finally:
+        numba.set_num_threads(prev_threads)
+        if chunked:
+            numba.set_parallel_chunksize(prev_chunk)
+
+
+def mean_HL(table, shape, win_size, base, step=1):
+    """Mean of the local entropy array without building it.
+
+    The mean over cells of the averaged local entropy is a weighted sum of
+    the window entropies, where each window is weighted by the sum of
+    `1 / (n * visits)` over the cells it covers. The visit counts are
+    separable along the axes, so the weights are a product of short
+    per-axis factors and no per-cell array is allocated.
+
+    Parameters
+    ----------
+    table: numpy.ndarray
+        Per-class cumulative counts from :obj:`cumulative_counts`.
+
+    shape: tuple
+        Shape of the classified data.
+
+    win_size: int, tuple
+        Window size, see :obj:`calculate_HL`.
+
+    base: int, float
+        Logarithmic base for the entropy calculation.
+
+    step: int, tuple, str, optional
+        Step between windows, see :obj:`calculate_HL`.
+
+    Returns
+    -------
+    HL: float
+        Same as `np.nanmean(calculate_HL(data, win_size, base, step=step))`.
+
+    """
+    win = _window_array(win_size, len(shape))
+    return mean_HL_serial(table, np.array(shape, dtype=np.int64), win,
+                          _step_array(step, win), float(base))
+
+
+def _codes(data, n_class):
+    """Return `data` as class codes and the number of classes."""
+    if n_class is None:
+        codes, labels = encode_labels(data)
+        return codes, len(labels)
+    return data, n_class
+
+
+def _window_array(win_size, ndim):
+    """Window size as an int64 array with one entry per dimension."""
+    if isinstance(win_size, tuple) is False:
+        win_size = (int(win_size),) * ndim
+    return np.array(win_size, dtype=np.int64)
+
+
+def _step_array(step, win):
+    """Window step as an int64 array, 'window' steps by the window size."""
+    if isinstance(step, str) and (step == 'window'):
+        return np.array(win, dtype=np.int64)
+    return _window_array(step, len(win))
+
+
+def encode_labels(data):
+    """Encode classified data as contiguous integer codes.
+
+    The kernels count classes with a fixed-length array instead of sorting
+    the contents of every window, so arbitrary labels (floats, digitize
+    indices with gaps, etc.) are mapped onto the codes 0..K-1 first.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        An ndarray with the classified data.
+
+    Returns
+    -------
+    codes: numpy.ndarray
+        Array of the same shape as `data` with values in 0..K-1, using the
+        smallest unsigned integer type that holds them so that the kernels
+        are compiled for (and stream) compact codes.
+        `data` itself if it already holds the codes 0..K-1 in that type,
+        otherwise it is the only full-size array allocated.
+
+    labels: numpy.ndarray
+        The K unique labels, such that `labels[codes]` is `data`.
+
+    """
+    data = np.asarray(data)
+    lo = label_offset(data)
+    if lo is not None:
+        # dense rank from a presence table, O(n) instead of a sort
+        flat = data.ravel()
+        present = count_labels(flat, lo, int(data.max()) - lo + 1) > 0
+        labels = (np.flatnonzero(present) + lo).astype(data.dtype)
+        dtype = np.min_scalar_type(max(len(labels) - 1, 0))
+        if (lo == 0) and np.all(present) and (data.dtype == dtype):
+            return data, labels  # already the codes, no copy
+        lut = (np.cumsum(present) - 1).astype(dtype)
+        codes = np.empty(np.shape(data), dtype=dtype)
+        apply_labels(flat, lo, lut, codes.reshape(-1))
+        return codes, labels
+    labels, codes = np.unique(data, return_inverse=True)
+    codes = codes.astype(np.min_scalar_type(max(len(labels) - 1, 0)))
+    return np.reshape(codes, np.shape(data)), labels
+
+
+def label_offset(data):
+    """Smallest label of integer `data` spanning fewer than 65536 values.
+
+    Returns None for other data, which are then encoded or counted by
+    sorting.
+    """
+    if (np.issubdtype(data.dtype, np.integer) is False) or (data.size == 0):
+        return None
+    lo, hi = int(data.min()), int(data.max())
+    if (hi - lo >= 2**16) or (lo < -2**63) or (hi >= 2**63):
+        return None
+    return lo
+
+
+@njit(cache=True)
+def count_labels(flat, lo, n):
+    """Count the labels `lo`..`lo+n-1` of the 1-D array `flat`.
+
+    Equivalent to `np.bincount(flat - lo)` without the full-size integer
+    temporary.
+    """
+    counts = np.zeros(n, dtype=np.int64)
+    for i in range(flat.size):
+        counts[np.int64(flat[i]) - lo] += 1
+    return counts
+
+
+@njit(cache=True)
+def apply_labels(flat, lo, lut, out):
+    """Write `lut[flat - lo]` to `out` without any temporary array."""
+    for i in range(flat.size):
+        out[i] = lut[np.int64(flat[i]) - lo]
+    return out
+
+
+def HL_1D_base2(data, win_size, h, cnt):
+    """Do the 1-D local entropy calculation with base 2.
+
+    Kept for backwards compatibility, `cnt` is no longer used as the visit
+    counts are computed analytically by :obj:`scatter_1D`.
+    """
+    codes, labels = encode_labels(data)
+    h = HL_1D_sliding(codes, len(labels), win_size, 1,
+                      plogp_table(win_size), h)
+    return h / np.log(2)
+
+
 def HL_1D_base10(data, win_size, h, cnt):
-    """Do the 1-D local entropy calculation with base 10."""
-    num_slides = len(data) - win_size + 1
-    for i in range(num_slides):
-        cnt[i:(i+win_size)] += 1  # count the cells visited by this window
-        unique_counts = np_unique_impl(data[i:(i+win_size)])
-        probs = []
-        for k in unique_counts:
-            probs.append(k / win_size)
-        # do entropy calculation
-        for j in range(len(probs)):
-            h[i:(i+win_size)] += -1 * probs[j] * np.log10(probs[j])
-    h = h / cnt  # make average by dividing by number of visits
-    return h
+    """Do the 1-D local entropy calculation with base 10.
+
+    Kept for backwards compatibility, `cnt` is no longer used as the visit
+    counts are computed analytically by :obj:`scatter_1D`.
+    """
+    codes, labels = encode_labels(data)
+    h = HL_1D_sliding(codes, len(labels), win_size, 1,
+                      plogp_table(win_size), h)
+    return h / np.log(10)
 
 
-@njit
 def HL_1D_basee(data, win_size, h, cnt):
-    """Do the 1-D local entropy calculation with base e."""
-    num_slides = len(data) - win_size + 1
+    """Do the 1-D local entropy calculation with base e.
+
+    Kept for backwards compatibility, `cnt` is no longer used as the visit
+    counts are computed analytically by :obj:`scatter_1D`.
+    """
+    codes, labels = encode_labels(data)
+    h = HL_1D_sliding(codes, len(labels), win_size, 1,
+                      plogp_table(win_size), h)
+    return h / np.log(np.e)
+
+
+@njit(cache=True)
+def HL_1D_sliding(codes, n_class, win_size, step, plogp, h):
+    """Do the 1-D local entropy calculation with a sliding histogram.
+
+    A running count of each class is kept as the window slides, `step`
+    cells enter and leave, so a window costs O(n_class + step) instead of a
+    sort of its contents and a whole scale is O(n). Windows that do not
+    overlap (`step >= win_size`) are counted afresh.
+    """
+    num_slides = n_windows(len(codes), win_size, step)
+    if num_slides < 1:
+        h[:] = np.nan  # window larger than the data, nothing visited
+        return h
+    # entropy of the window at each position, offset by one so that
+    # scatter_1D can turn it into prefix sums in place
+    hw = np.zeros(num_slides + 1)
+    counts = np.zeros(n_class, dtype=np.int64)
+    for i in range(win_size):
+        counts[codes[i]] += 1
+    hw[1] = window_entropy(counts, win_size, plogp)
+    for i in range(1, num_slides):
+        p = i * step
+        if step >= win_size:
+            counts[:] = 0
+            for c in range(p, p + win_size):
+                counts[codes[c]] += 1
+        elif (step == 1) and (codes[p-1] == codes[p+win_size-1]):
+            hw[i+1] = hw[i]  # window contents did not change
+            continue
+        else:
+            for c in range(p - step, p):
+                counts[codes[c]] -= 1
+            for c in range(p - step + win_size, p + win_size):
+                counts[codes[c]] += 1
+        hw[i+1] = window_entropy(counts, win_size, plogp)
+    return scatter_1D(hw, win_size, step, h)
+
+
+@njit(cache=True)
+def HL_2D_sliding(codes, n_class, win_y, win_x, step_y, step_x, plogp, h):
+    """Do the 2-D local entropy calculation with sliding histograms.
+
+    Per-column class counts over the current band of `win_y` rows are
+    kept, moving the band down only updates the entering and leaving
+    rows. Along the band the window histogram is updated by adding the
+    entering column counts and removing the leaving ones, so each window
+    costs O(n_class * step_x) regardless of its area. Steps at least as
+    large as the window recount the band or window instead.
+    """
+    ny, nx = codes.shape
+    slides_y = n_windows(ny, win_y, step_y)
+    slides_x = n_windows(nx, win_x, step_x)
+    if (slides_y < 1) or (slides_x < 1):
+        h[:, :] = np.nan  # window larger than the data, nothing visited
+        return h
+    area = win_y * win_x
+    # entropy of the window at each position, offset as in HL_1D_sliding
+    hw = np.zeros((slides_y + 1, slides_x + 1))
+    col = np.zeros((nx, n_class), dtype=np.int64)
+    counts = np.zeros(n_class, dtype=np.int64)
+    for y in range(win_y):
+        for x in range(nx):
+            col[x, codes[y, x]] += 1
+    for i in range(slides_y):
+        p = i * step_y
+        if (i > 0) and (step_y >= win_y):
+            # no overlap with the previous band, count it again
+            col[:, :] = 0
+            for y in range(p, p + win_y):
+                for x in range(nx):
+                    col[x, codes[y, x]] += 1
+        elif i > 0:
+            # move the band of rows down by one step
+            for y in range(p - step_y, p):
+                for x in range(nx):
+                    col[x, codes[y, x]] -= 1
+            for y in range(p - step_y + win_y, p + win_y):
+                for x in range(nx):
+                    col[x, codes[y, x]] += 1
+        counts[:] = 0
+        for x in range(win_x):
+            for k in range(n_class):
+                counts[k] += col[x, k]
+        hw[i+1, 1] = window_entropy(counts, area, plogp)
+        for j in range(1, slides_x):
+            q = j * step_x
+            if step_x >= win_x:
+                counts[:] = 0
+                for x in range(q, q + win_x):
+                    for k in range(n_class):
+                        counts[k] += col[x, k]
+            else:
+                for x in range(q - step_x, q):
+                    for k in range(n_class):
+                        counts[k] += col[x+win_x, k] - col[x, k]
+            hw[i+1, j+1] = window_entropy(counts, area, plogp)
+    return scatter_2D(hw, win_y, win_x, step_y, step_x, h)
+
+
+def cumulative_counts(codes, n_class):
+    """Build the per-class cumulative counts of 1-D, 2-D or 3-D data.
+
+    Parameters
+    ----------
+    codes: numpy.ndarray
+        Array of class codes in 0..n_class-1, see :obj:`encode_labels`.
+
+    n_class: int
+        Number of classes.
+
+    Returns
+    -------
+    table: numpy.ndarray
+        Array with one more entry than `codes` along each axis and a
+        trailing axis of length `n_class`. In 3-D, `table[z, y, x, k]` is
+        the number of cells of class `k` in `codes[:z, :y, :x]` (a prefix
+        sum in 1-D, summed-area table in 2-D and summed-volume table in
+        3-D). The counts of any window are then an O(1) lookup.
+
+    """
+    return new_table(codes, n_class, _table_proto(np.size(codes)))
+
+
+def _table_proto(size):
+    """Empty array with the dtype of the count table for `size` cells."""
+    # int32 is enough unless the data itself has more cells than that
+    if size < np.iinfo(np.int32).max:
+        return np.zeros(0, dtype=np.int32)
+    return np.zeros(0, dtype=np.int64)
+
+
+@njit(cache=True)
+def new_table(codes, n_class, proto):
+    """Allocate and fill the cumulative counts of 1-D, 2-D or 3-D codes.
+
+    The branch is picked from the number of dimensions when compiling, so
+    callers do not pass a per-dimension kernel around and stay cacheable.
+    """
+    if codes.ndim == 1:
+        return _new_table_1D(codes, n_class, proto)
+    elif codes.ndim == 2:
+        return _new_table_2D(codes, n_class, proto)
+    return _new_table_3D(codes, n_class, proto)
+
+
+@njit(cache=True)
+def _new_table_1D(codes, n_class, proto):
+    """Allocate and fill the cumulative counts of 1-D codes."""
+    table = np.zeros((codes.shape[0] + 1, n_class), proto.dtype)
+    return _fill_cumulative_1D(codes, table)
+
+
+@njit(cache=True)
+def _new_table_2D(codes, n_class, proto):
+    """Allocate and fill the cumulative counts of 2-D codes."""
+    ny, nx = codes.shape
+    table = np.zeros((ny + 1, nx + 1, n_class), proto.dtype)
+    return _fill_cumulative_2D(codes, table)
+
+
+@njit(cache=True)
+def _new_table_3D(codes, n_class, proto):
+    """Allocate and fill the cumulative counts of 3-D codes."""
+    nz, ny, nx = codes.shape
+    table = np.zeros((nz + 1, ny + 1, nx + 1, n_class), proto.dtype)
+    return _fill_cumulative_3D(codes, table)
+
+
+@njit(cache=True)
+def _fill_cumulative_1D(codes, table):
+    """Fill the prefix counts in place, see cumulative_counts."""
+    n_class = table.shape[1]
+    for i in range(len(codes)):
+        for k in range(n_class):
+            table[i+1, k] = table[i, k]
+        table[i+1, codes[i]] += 1
+    return table
+
+
+@njit(cache=True)
+def _fill_cumulative_2D(codes, table):
+    """Fill the summed-area table in place, see cumulative_counts."""
+    ny, nx = codes.shape
+    n_class = table.shape[2]
+    for y in range(ny):
+        for x in range(nx):
+            for k in range(n_class):
+                table[y+1, x+1, k] = (table[y, x+1, k] + table[y+1, x, k] -
+                                      table[y, x, k])
+            table[y+1, x+1, codes[y, x]] += 1
+    return table
+
+
+@njit(cache=True)
+def _fill_cumulative_3D(codes, table):
+    """Fill the summed-volume table in place, see cumulative_counts."""
+    nz, ny, nx = codes.shape
+    n_class = table.shape[3]
+    for z in range(nz):
+        for y in range(ny):
+            for x in range(nx):
+                table[z+1, y+1, x+1, codes[z, y, x]] = 1
+    # cumulative sum along each axis in turn
+    for z in range(1, nz + 1):
+        for y in range(1, ny + 1):
+            for x in range(1, nx + 1):
+                for k in range(n_class):
+                    table[z, y, x, k] += table[z-1, y, x, k]
+    for z in range(1, nz + 1):
+        for y in range(1, ny + 1):
+            for x in range(1, nx + 1):
+                for k in range(n_class):
+                    table[z, y, x, k] += table[z, y-1, x, k]
+    for z in range(1, nz + 1):
+        for y in range(1, ny + 1):
+            for x in range(1, nx + 1):
+                for k in range(n_class):
+                    table[z, y, x, k] += table[z, y, x-1, k]
+    return table
+
+
+@njit(cache=True)
+def HL_1D_table(table, win_size, step, plogp, h):
+    """Do the 1-D local entropy calculation from prefix class counts."""
+    n_class = table.shape[1]
+    num_slides = n_windows(len(h), win_size, step)
+    if num_slides < 1:
+        h[:] = np.nan  # window larger than the data, nothing visited
+        return h
+    hw = np.zeros(num_slides + 1)
+    counts = np.zeros(n_class, dtype=np.int64)
+    for i in range(num_slides):
+        p = i * step
+        for k in range(n_class):
+            counts[k] = table[p+win_size, k] - table[p, k]
+        hw[i+1] = window_entropy(counts, win_size, plogp)
+    return scatter_1D(hw, win_size, step, h)
+
+
+@njit(cache=True)
+def HL_2D_table(table, win_y, win_x, step_y, step_x, plogp, h):
+    """Do the 2-D local entropy calculation from a summed-area table."""
+    ny, nx = h.shape
+    n_class = table.shape[2]
+    slides_y = n_windows(ny, win_y, step_y)
+    slides_x = n_windows(nx, win_x, step_x)
+    if (slides_y < 1) or (slides_x < 1):
+        h[:, :] = np.nan  # window larger than the data, nothing visited
+        return h
+    area = win_y * win_x
+    hw = np.zeros((slides_y + 1, slides_x + 1))
+    counts = np.zeros(n_class, dtype=np.int64)
+    for i in range(slides_y):
+        i0 = i * step_y
+        i1 = i0 + win_y
+        for j in range(slides_x):
+            j0 = j * step_x
+            j1 = j0 + win_x
+            for k in range(n_class):
+                counts[k] = (table[i1, j1, k] - table[i0, j1, k] -
+                             table[i1, j0, k] + table[i0, j0, k])
+            hw[i+1, j+1] = window_entropy(counts, area, plogp)
+    return scatter_2D(hw, win_y, win_x, step_y, step_x, h)
+
+
+@njit(cache=True)
+def HL_3D_table(table, win_z, win_y, win_x, step_z, step_y, step_x, plogp,
+                h):
+    """Do the 3-D local entropy calculation from a summed-volume table.
+
+    The class counts of each cubic window are read from the eight corners
+    of the window in the table, so every window costs O(n_class) no matter
+    its volume.
+    """
+    nz, ny, nx = h.shape
+    n_class = table.shape[3]
+    slides_z = n_windows(nz, win_z, step_z)
+    slides_y = n_windows(ny, win_y, step_y)
+    slides_x = n_windows(nx, win_x, step_x)
+    if (slides_z < 1) or (slides_y < 1) or (slides_x < 1):
+        h[:, :, :] = np.nan  # window larger than the data, nothing visited
+        return h
+    vol = win_z * win_y * win_x
+    # entropy of the window at each position
+    hw = np.zeros((slides_z + 1, slides_y + 1, slides_x + 1))
+    counts = np.zeros(n_class, dtype=np.int64)
+    for i in range(slides_z):
+        i0 = i * step_z
+        i1 = i0 + win_z
+        for j in range(slides_y):
+            j0 = j * step_y
+            j1 = j0 + win_y
+            for m in range(slides_x):
+                m0 = m * step_x
+                m1 = m0 + win_x
+                for k in range(n_class):
+                    counts[k] = (table[i1, j1, m1, k] - table[i0, j1, m1, k] -
+                                 table[i1, j0, m1, k] - table[i1, j1, m0, k] +
+                                 table[i0, j0, m1, k] + table[i0, j1, m0, k] +
+                                 table[i1, j0, m0, k] - table[i0, j0, m0, k])
+                hw[i+1, j+1, m+1] = window_entropy(counts, vol, plogp)
+    return scatter_3D(hw, win_z, win_y, win_x, step_z, step_y, step_x, h)
+
+
+@njit(cache=True)
+def mean_HL_serial(table, shape, win, step, base):
+    """Evaluate a mean kernel over all window positions of one scale."""
+    if np.any(shape < win):
+        return np.nan  # window larger than the data, nothing visited
+    plogp = plogp_table(np.prod(win))
+    HL = mean_kernel(table, shape, win, step, plogp, 0,
+                     n_windows(shape[0], win[0], step[0]))
+    return HL / np.log(base)
+
+
+@njit(parallel=True, cache=True)
+def mean_HL_scales(table, shape, wins, steps, base):
+    """Evaluate a mean kernel for each scale in parallel."""
+    HL = np.zeros(len(wins))
+    for i in prange(len(wins)):
+        HL[i] = mean_HL_serial(table, shape, wins[i], steps[i], base)
+    return HL
+
+
+@njit(parallel=True, cache=True)
+def mean_HL_tiles(table, shape, win, step, base, n_tiles):
+    """Evaluate one scale in parallel over tiles of window positions.
+
+    The data is split along the first axis. Windows starting in a tile
+    read the counts of the cells past its edge straight from the shared
+    table, so no halo has to be copied.
+    """
+    if np.any(shape < win):
+        return np.nan  # window larger than the data, nothing visited
+    plogp = plogp_table(np.prod(win))
+    num_slides = n_windows(shape[0], win[0], step[0])
+    n_tiles = max(1, min(n_tiles, num_slides))
+    parts = np.zeros(n_tiles)
+    for t in prange(n_tiles):
+        start = (t * num_slides) // n_tiles
+        stop = ((t + 1) * num_slides) // n_tiles
+        parts[t] = mean_kernel(table, shape, win, step, plogp, start, stop)
+    # fixed summation order keeps the result independent of scheduling
+    return np.sum(parts) / np.log(base)
+
+
+@njit(parallel=True, cache=True)
+def batch_HR(codes, n_class, proto, wins, steps, base):
+    """Entrogram of each realization along the first axis of `codes`."""
+    n_real = codes.shape[0]
+    shape = np.array(codes.shape[1:], dtype=np.int64)
+    HR = np.zeros((n_real, len(wins)))
+    for r in prange(n_real):
+        member = codes[r]
+        table = new_table(member, n_class, proto)
+        # global entropy of the realization
+        counts = np.bincount(member.ravel(), minlength=n_class)
+        HG = 0.0
+        for k in range(n_class):
+            if counts[k] > 0:
+                prob = counts[k] / member.size
+                HG += -1 * prob * np.log(prob)
+        HG = HG / np.log(base)
+        for i in range(len(wins)):
+            if HG == 0:
+                HR[r, i] = np.nan  # single class, entrogram is undefined
+            else:
+                HR[r, i] = mean_HL_serial(table, shape, wins[i], steps[i],
+                                          base) / HG
+    return HR
+
+
+@njit(cache=True)
+def mean_HL_1D(table, shape, win, step, plogp, start, stop):
+    """Mean 1-D local entropy accumulated directly into a scalar.
+
+    Sums the contribution of the windows `start..stop-1`. The window
+    weight is updated as the window slides, so memory use is O(n_class)
+    whatever the length of the data.
+    """
+    n = shape[0]
+    win_size = win[0]
+    s = step[0]
+    n_class = table.shape[1]
+    n_cov = covered(n, win_size, s)
+    counts = np.zeros(n_class, dtype=np.int64)
+    # sum of 1 / visits over the cells of the first window
+    weight = window_weight(start, n, win_size, s)
+    total = 0.0
+    for i in range(start, stop):
+        p = i * s
+        if (i > start) and (s >= win_size):
+            weight = window_weight(i, n, win_size, s)
+        elif i > start:
+            for j in range(p - s, p):
+                weight += (1 / visits(j+win_size, n, win_size, s) -
+                           1 / visits(j, n, win_size, s))
+        for k in range(n_class):
+            counts[k] = table[p+win_size, k] - table[p, k]
+        total += window_entropy(counts, win_size, plogp) * (weight / n_cov)
+    return total
+
+
+@njit(cache=True)
+def mean_HL_2D(table, shape, win, step, plogp, start, stop):
+    """Mean 2-D local entropy accumulated directly into a scalar."""
+    win_y, win_x = win[0], win[1]
+    n_class = table.shape[2]
+    wgt_y = axis_weights(shape[0], win_y, step[0])
+    wgt_x = axis_weights(shape[1], win_x, step[1])
+    area = win_y * win_x
+    counts = np.zeros(n_class, dtype=np.int64)
+    total = 0.0
+    for i in range(start, stop):
+        i0 = i * step[0]
+        i1 = i0 + win_y
+        for j in range(len(wgt_x)):
+            j0 = j * step[1]
+            j1 = j0 + win_x
+            for k in range(n_class):
+                counts[k] = (table[i1, j1, k] - table[i0, j1, k] -
+                             table[i1, j0, k] + table[i0, j0, k])
+            total += window_entropy(counts, area, plogp) * wgt_y[i] * wgt_x[j]
+    return total
+
+
+@njit(cache=True)
+def mean_HL_3D(table, shape, win, step, plogp, start, stop):
+    """Mean 3-D local entropy accumulated directly into a scalar."""
+    win_z, win_y, win_x = win[0], win[1], win[2]
+    n_class = table.shape[3]
+    wgt_z = axis_weights(shape[0], win_z, step[0])
+    wgt_y = axis_weights(shape[1], win_y, step[1])
+    wgt_x = axis_weights(shape[2], win_x, step[2])
+    vol = win_z * win_y * win_x
+    counts = np.zeros(n_class, dtype=np.int64)
+    total = 0.0
+    for i in range(start, stop):
+        i0 = i * step[0]
+        i1 = i0 + win_z
+        for j in range(len(wgt_y)):
+            j0 = j * step[1]
+            j1 = j0 + win_y
+            for m in range(len(wgt_x)):
+                m0 = m * step[2]
+                m1 = m0 + win_x
+                for k in range(n_class):
+                    counts[k] = (table[i1, j1, m1, k] - table[i0, j1, m1, k] -
+                                 table[i1, j0, m1, k] - table[i1, j1, m0, k] +
+                                 table[i0, j0, m1, k] + table[i0, j1, m0, k] +
+                                 table[i1, j0, m0, k] - table[i0, j0, m0, k])
+                total += (window_entropy(counts, vol, plogp) *
+                          wgt_z[i] * wgt_y[j] * wgt_x[m])
+    return total
+
+
+@njit(cache=True)
+def sample_HL(codes, n_class, win, starts, plogp):
+    """Entropy (in nats) of the 3-D windows starting at `starts`."""
+    vol = win[0] * win[1] * win[2]
+    hw = np.zeros(len(starts))
+    counts = np.zeros(n_class, dtype=np.int64)
+    for s in range(len(starts)):
+        z0, y0, x0 = starts[s, 0], starts[s, 1], starts[s, 2]
+        counts[:] = 0
+        for z in range(z0, z0 + win[0]):
+            for y in range(y0, y0 + win[1]):
+                for x in range(x0, x0 + win[2]):
+                    counts[codes[z, y, x]] += 1
+        hw[s] = window_entropy(counts, vol, plogp)
+    return hw
+
+
+@njit(cache=True)
+def mean_kernel(table, shape, win, step, plogp, start, stop):
+    """Mean kernel for the number of dimensions of the count table."""
+    if table.ndim == 2:
+        return mean_HL_1D(table, shape, win, step, plogp, start, stop)
+    elif table.ndim == 3:
+        return mean_HL_2D(table, shape, win, step, plogp, start, stop)
+    return mean_HL_3D(table, shape, win, step, plogp, start, stop)
+
+
+@njit(cache=True)
+def n_windows(n, win_size, step):
+    """Number of window positions along an axis of length `n`."""
+    if n < win_size:
+        return 0
+    return (n - win_size) // step + 1
+
+
+@njit(cache=True)
+def covering(j, n, win_size, step):
+    """First and last window along an axis that cover cell `j`.
+
+    Window `i` starts at cell `i * step`. The last is before the first if
+    the cell falls in a gap between windows or past the last one.
+    """
+    lo = (max(j - win_size + 1, 0) + step - 1) // step
+    hi = min(j // step, n_windows(n, win_size, step) - 1)
+    return lo, hi
+
+
+@njit(cache=True)
+def visits(j, n, win_size, step=1):
+    """Number of windows along an axis of length `n` that cover cell `j`."""
+    lo, hi = covering(j, n, win_size, step)
+    return max(hi - lo + 1, 0)
+
+
+@njit(cache=True)
+def covered(n, win_size, step):
+    """Number of cells along an axis covered by at least one window."""
+    return ((n_windows(n, win_size, step) - 1) * min(step, win_size) +
+            win_size)
+
+
+@njit(cache=True)
+def window_weight(i, n, win_size, step):
+    """Sum of `1 / visits` over the cells covered by window `i`."""
+    weight = 0.0
+    for j in range(i * step, i * step + win_size):
+        weight += 1 / visits(j, n, win_size, step)
+    return weight
+
+
+@njit(cache=True)
+def axis_weights(n, win_size, step=1):
+    """Per-axis factor of the window weights used by the mean kernels.
+
+    Entry `i` is the sum of `1 / (n_cov * visits)` over the cells covered
+    by window `i`, where `n_cov` is the number of cells along the axis
+    covered by any window.
+    """
+    num_slides = n_windows(n, win_size, step)
+    n_cov = covered(n, win_size, step)
+    wgt = np.zeros(num_slides)
+    acc = window_weight(0, n, win_size, step)
+    for i in range(num_slides):
+        p = i * step
+        if (i > 0) and (step >= win_size):
+            acc = window_weight(i, n, win_size, step)
+        elif i > 0:
+            for j in range(p - step, p):
+                acc += (1 / visits(j+win_size, n, win_size, step) -
+                        1 / visits(j, n, win_size, step))
+        wgt[i] = acc / n_cov
+    return wgt
+
+
+@njit(cache=True)
+def window_entropy(counts, vol, plogp):
+    """Entropy (in nats) of a single window from its per-class counts.
+
+    The terms `-(c/vol) * log(c/vol)` are read from the table made by
+    :obj:`plogp_table` for the window volume, and only computed directly
+    when the table was too large to build.
+    """
+    H = 0.0
+    if len(plogp) > 0:
+        for k in range(len(counts)):
+            H += plogp[counts[k]]
+    else:
+        for k in range(len(counts)):
+            if counts[k] > 0:
+                prob = counts[k] / vol
+                H += -1 * prob * np.log(prob)
+    return H
+
+
+@njit(cache=True)
+def plogp_table(vol):
+    """Table of `-(c/vol) * log(c/vol)` for the counts c = 0..vol.
+
+    Window counts are integers, so the entropy terms of every window at a
+    scale come from this one table instead of a log per class and window.
+    The log base is applied afterwards as a single division. Returns an
+    empty table if `vol` exceeds `PLOGP_MAX`, such windows are few.
+    """
+    if vol > PLOGP_MAX:
+        return np.zeros(0)
+    plogp = np.zeros(vol + 1)
+    for c in range(1, vol + 1):
+        prob = c / vol
+        plogp[c] = -1 * prob * np.log(prob)
+    return plogp
+
+
+@njit(cache=True)
+def scatter_1D(csum, win_size, step, h):
+    """Average the window entropies onto the cells each window visited.
+
+    Cell `j` is visited by the consecutive windows given by
+    :obj:`covering`, so the sum over those windows is a difference of
+    prefix sums and the visit count is known without accumulating a `cnt`
+    array. Cells no window visited are nan.
+
+    `csum[i+1]` holds the entropy of window `i` (`csum[0]` is 0) and is
+    turned into the prefix sums in place, so no other temporary array is
+    needed. `h` can be float32 or float64.
+    """
+    num_slides = len(csum) - 1
     for i in range(num_slides):
-        cnt[i:(i+win_size)] += 1  # count the cells visited by this window
-        unique_counts = np_unique_impl(data[i:(i+win_size)])
-        probs = []
-        for k in unique_counts:
-            probs.append(k / win_size)
-        # do entropy calculation
-        for j in range(len(probs)):
-            h[i:(i+win_size)] += -1 * probs[j] * np.log(probs[j])
-    h = h / cnt  # make average by dividing by number of visits
+        csum[i+1] = csum[i] + csum[i+1]
+    n = len(h)
+    for j in range(n):
+        lo, hi = covering(j, n, win_size, step)
+        if hi < lo:
+            h[j] = np.nan
+        else:
+            h[j] = (csum[hi+1] - csum[lo]) / (hi - lo + 1)
+    return h
+
+
+@njit(cache=True)
+def scatter_2D(csum, win_y, win_x, step_y, step_x, h):
+    """Average the 2-D window entropies onto the cells they visited.
+
+    Same as :obj:`scatter_1D` using a summed-area table of the window
+    entropies, built in place.
+    """
+    slides_y = csum.shape[0] - 1
+    slides_x = csum.shape[1] - 1
+    for i in range(slides_y):
+        for j in range(slides_x):
+            csum[i+1, j+1] = (csum[i+1, j+1] + csum[i, j+1] +
+                              csum[i+1, j] - csum[i, j])
+    ny, nx = h.shape
+    for y in range(ny):
+        ylo, yhi = covering(y, ny, win_y, step_y)
+        for x in range(nx):
+            xlo, xhi = covering(x, nx, win_x, step_x)
+            if (yhi < ylo) or (xhi < xlo):
+                h[y, x] = np.nan
+                continue
+            total = (csum[yhi+1, xhi+1] - csum[ylo, xhi+1] -
+                     csum[yhi+1, xlo] + csum[ylo, xlo])
+            h[y, x] = total / ((yhi - ylo + 1) * (xhi - xlo + 1))
+    return h
+
+
+@njit(cache=True)
+def scatter_3D(csum, win_z, win_y, win_x, step_z, step_y, step_x, h):
+    """Average the 3-D window entropies onto the cells they visited.
+
+    Same as :obj:`scatter_1D` using a summed-volume table of the window
+    entropies, built in place.
+    """
+    slides_z = csum.shape[0] - 1
+    slides_y = csum.shape[1] - 1
+    slides_x = csum.shape[2] - 1
+    for i in range(slides_z):
+        for j in range(slides_y):
+            for m in range(slides_x):
+                csum[i+1, j+1, m+1] = (csum[i+1, j+1, m+1] +
+                                       csum[i, j+1, m+1] +
+                                       csum[i+1, j, m+1] +
+                                       csum[i+1, j+1, m] -
+                                       csum[i, j, m+1] -
+                                       csum[i, j+1, m] -
+                                       csum[i+1, j, m] +
+                                       csum[i, j, m])
+    nz, ny, nx = h.shape
+    for z in range(nz):
+        z0, z1 = covering(z, nz, win_z, step_z)
+        z1 += 1
+        for y in range(ny):
+            y0, y1 = covering(y, ny, win_y, step_y)
+            y1 += 1
+            for x in range(nx):
+                x0, x1 = covering(x, nx, win_x, step_x)
+                x1 += 1
+                if (z1 <= z0) or (y1 <= y0) or (x1 <= x0):
+                    h[z, y, x] = np.nan
+                    continue
+                total = (csum[z1, y1, x1] - csum[z0, y1, x1] -
+                         csum[z1, y0, x1] - csum[z1, y1, x0] +
+                         csum[z0, y0, x1] + csum[z0, y1, x0] +
+                         csum[z1, y0, x0] - csum[z0, y0, x0])
+                h[z, y, x] = total / ((z1 - z0) * (y1 - y0) * (x1 - x0))
     return h
 
 
-@njit
+def jenks_breaks(data, nb_class, sample_size=None, sampling='random',
+                 random_state=None):
+    """Compute Fisher-Jenks natural breaks of some data.
+
+    The dynamic program runs on the sorted unique values of the data
+    weighted by their counts, so repeated values cost nothing extra. As it
+    is O(nb_class * m^2) in the number of unique values m, it can be fit on
+    a sample of the data instead.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        Values to compute the breaks of, any shape.
+
+    nb_class: int
+        Desired number of classes. Fewer classes are returned if there are
+        fewer unique values than that.
+
+    sample_size: int, optional
+        If given, the breaks are fit on this many values drawn from `data`.
+
+    sampling: str, optional
+        How to draw the sample, 'random' (uniform with replacement) or
+        'stratified' (evenly spaced quantiles of the sorted data, always
+        including its minimum and maximum). Stratified sampling sorts a
+        copy of all of the data, so memory-mapped data should be sampled
+        at random.
+
+    random_state: int, numpy.random.Generator, optional
+        Seed or generator for the 'random' sampling.
+
+    Returns
+    -------
+    breaks: numpy.ndarray
+        The class limits, the minimum of the (sampled) values followed by
+        the upper limit of each class.
+
+    cuts: numpy.ndarray
+        The `nb_class - 1` thresholds to label values with, halfway between
+        the upper limit of a class and the lowest value of the next one.
+        Values in the fitted data are labelled the same as by the breaks,
+        values falling between the classes of a sample go to the nearer
+        class.
+
+    """
+    values = np.ravel(data)
+    if (sample_size is not None) and (sample_size < len(values)):
+        if sampling == 'random':
+            rng = np.random.default_rng(random_state)
+            values = values[rng.integers(0, len(values), sample_size)]
+        elif sampling == 'stratified':
+            idx = np.linspace(0, len(values) - 1, sample_size)
+            values = np.sort(values)[np.round(idx).astype(np.intp)]
+        else:
+            raise ValueError('sampling must be "random" or "stratified", '
+                             'was: %s' % str(sampling))
+    values, weights = np.unique(values, return_counts=True)
+    nb_class = min(nb_class, len(values))
+    return _jenks_dp(values.astype(np.float64), weights.astype(np.float64),
+                     nb_class)
+
+
+@njit(cache=True)
+def _jenks_dp(values, weights, nb_class):
+    """Weighted Fisher-Jenks dynamic program on sorted unique values."""
+    m = len(values)
+    # lower class limits (1-based) and within-class variances
+    lower = np.zeros((m + 1, nb_class + 1), dtype=np.int64)
+    var = np.full((m + 1, nb_class + 1), np.inf)
+    for j in range(1, nb_class + 1):
+        lower[1, j] = 1
+        var[1, j] = 0.0
+    for i in range(2, m + 1):
+        s1 = 0.0
+        s2 = 0.0
+        w = 0.0
+        v = 0.0
+        for n in range(1, i + 1):
+            # class from value i3 up to value i
+            i3 = i - n + 1
+            val = values[i3-1]
+            w += weights[i3-1]
+            s1 += val * weights[i3-1]
+            s2 += val * val * weights[i3-1]
+            v = s2 - (s1 * s1) / w
+            i4 = i3 - 1
+            if i4 != 0:
+                for j in range(2, nb_class + 1):
+                    if var[i, j] >= (v + var[i4, j-1]):
+                        lower[i, j] = i3
+                        var[i, j] = v + var[i4, j-1]
+        lower[i, 1] = 1
+        var[i, 1] = v
+    # walk back through the lower limits
+    breaks = np.zeros(nb_class + 1)
+    cuts = np.zeros(nb_class - 1)
+    breaks[0] = values[0]
+    breaks[nb_class] = values[m-1]
+    k = m
+    for j in range(nb_class, 1, -1):
+        idx = lower[k, j] - 2
+        breaks[j-1] = values[idx]
+        cuts[j-2] = 0.5 * (values[idx] + values[idx+1])
+        k = lower[k, j] - 1
+    return breaks, cuts
+
+
+@njit(cache=True)
 def np_unique_impl(a):
     """Get unique counts, from: https://github.com/numba/numba/issues/2884."""
     b = np.sort(a.flatten())
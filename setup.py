@@ -14,4 +14,5 @@ setup(
     classifiers=['Programming Language :: Python :: 3.7',
                  'Programming Language :: Python :: 3.8'],
     install_requires=['numpy', 'matplotlib', 'scipy', 'xarray', 'numba'],
+    extras_require={'dask': ['dask[array]']},
 )
@@ -0,0 +1,156 @@
+"""Unit tests for cache.py."""
+
+import os
+import pytest
+import numpy as np
+from entrogrammer import cache
+from entrogrammer import classifier
+from entrogrammer import core
+from entrogrammer import tools
+
+
+def test_content_hash():
+    """Test the hash depends on the contents, dtype and shape."""
+    data = np.arange(12, dtype=np.uint8)
+    assert cache.content_hash(data) == cache.content_hash(data.copy())
+    assert cache.content_hash(data) != cache.content_hash(data[::-1])
+    assert cache.content_hash(data) != cache.content_hash(
+        data.astype(np.uint16))
+    assert cache.content_hash(data) != cache.content_hash(
+        data.reshape(3, 4))
+
+
+def test_content_hash_blocks(monkeypatch):
+    """Test hashing block by block gives the same hash."""
+    data = np.random.default_rng(0).integers(0, 3, (10, 7))
+    whole = cache.content_hash(data)
+    monkeypatch.setattr(cache, 'HASH_BYTES', 3 * data[0].nbytes)
+    assert cache.content_hash(data) == whole
+
+
+def test_key_version(monkeypatch):
+    """Test keys change with the package version."""
+    data = np.arange(4)
+    key = cache.ResultCache.key('m', data, a=1)
+    assert cache.ResultCache.key('m', data, a=1) == key
+    assert cache.ResultCache.key('m', data, a=2) != key
+    monkeypatch.setattr(cache, '__version__', '0.0.0')
+    assert cache.ResultCache.key('m', data, a=1) != key
+
+
+def test_memory_lru():
+    """Test the least recently used results are evicted from memory."""
+    rc = cache.ResultCache(memory_bytes=2 * 80)
+    for i in range(3):
+        rc.put(str(i), {'a': np.full(10, i, dtype=float)})
+    assert rc.get('0') is None
+    rc.get('1')  # now more recent than '2'
+    rc.put('3', {'a': np.zeros(10)})
+    assert rc.get('2') is None
+    assert np.all(rc.get('1')['a'] == 1)
+
+
+def test_get_returns_copy():
+    """Test results handed out can be modified without changing the cache."""
+    rc = cache.ResultCache()
+    rc.put('k', {'a': np.zeros(4)})
+    rc.get('k')['a'][:] = 1
+    assert np.all(rc.get('k')['a'] == 0)
+
+
+def test_disk_tier(tmp_path):
+    """Test results persist on disk and the directory size is bounded."""
+    rc = cache.ResultCache(tmp_path, max_bytes=3000, memory_bytes=0)
+    for i in range(5):
+        rc.put(str(i), {'a': np.full(100, i, dtype=float)})
+    files = [f for f in os.listdir(tmp_path) if f.endswith('.npz')]
+    assert 0 < len(files) < 5
+    assert sum(os.path.getsize(tmp_path / f) for f in files) <= 3000
+    # a new cache on the same directory finds the latest result
+    assert np.all(cache.ResultCache(tmp_path).get('4')['a'] == 4)
+    rc.clear()
+    assert rc.get('4') is None
+
+
+def test_corrupt_file(tmp_path):
+    """Test an unreadable file is treated as missing."""
+    rc = cache.ResultCache(tmp_path)
+    (tmp_path / 'bad.npz').write_bytes(b'not a file')
+    assert rc.get('bad') is None
+    assert os.path.exists(tmp_path / 'bad.npz') is False
+
+
+def test_core_cache(tmp_path, monkeypatch):
+    """Test the core functions return cached results."""
+    rc = cache.ResultCache(tmp_path)
+    data = np.random.default_rng(1).random((20, 16))
+    hc = classifier.HistogramClassifier(data, bins=3)
+    HG = core.global_entropy(hc, cache=rc)
+    HL = core.local_entropy(hc, 4, step=2, cache=rc)
+    HR, win_size = core.calculate_entrogram(hc, max_win=6, cache=rc)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('result was not cached')
+    for name in ('calculate_HG', 'calculate_HL', 'calculate_multiscale_HL'):
+        monkeypatch.setattr(tools, name, fail)
+    # same labels from another classifier, found on disk
+    rc = cache.ResultCache(tmp_path)
+    ref = classifier.HistogramClassifier(data, bins=3)
+    assert core.global_entropy(ref, cache=rc) == HG
+    assert np.array_equal(core.local_entropy(ref, (4, 4), step=2, cache=rc),
+                          HL, equal_nan=True)
+    out = np.zeros(data.shape)
+    assert core.local_entropy(ref, 4, step=2, out=out, cache=rc) is out
+    assert np.array_equal(out, HL, equal_nan=True)
+    stages = []
+    assert core.calculate_entrogram(ref, max_win=6, cache=rc,
+                                    callback=stages.append) == (HR, win_size)
+    assert [s['stage'] for s in stages] == ['check', 'cache']
+    # other parameters are computed
+    with pytest.raises(AssertionError):
+        core.local_entropy(ref, 3, cache=rc)
+
+
+def test_core_cache_out_dtype():
+    """Test results written to `out` are keyed by the dtype of `out`."""
+    rc = cache.ResultCache()
+    data = np.random.default_rng(3).random((12, 10))
+    hc = classifier.HistogramClassifier(data, bins=3)
+    out = np.empty(data.shape, dtype=np.float32)
+    assert core.local_entropy(hc, 3, out=out, cache=rc) is out
+    HL = core.local_entropy(hc, 3, cache=rc)
+    assert HL.dtype == np.float64
+    assert np.array_equal(HL, core.local_entropy(hc, 3))
+    assert core.local_entropy(hc, 3, dtype=np.float32,
+                              cache=rc).dtype == np.float32
+
+
+def test_core_cache_cancelled():
+    """Test cancelled entrograms are not stored."""
+    rc = cache.ResultCache()
+    hc = classifier.BinaryClassifier(
+        np.random.default_rng(2).random(50), 0.5)
+    HR, _ = core.calculate_entrogram(
+        hc, max_win=10, cache=rc,
+        callback=lambda info: info['stage'] == 'scale')
+    assert len(HR) == 1
+    HR, win_size = core.calculate_entrogram(hc, max_win=10, cache=rc)
+    assert len(HR) == len(win_size) == 9
+
+
+def test_default_cache(tmp_path, monkeypatch):
+    """Test cache=True uses the directory from the environment."""
+    monkeypatch.setenv('ENTROGRAMMER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache, '_default', None)
+    hc = classifier.BinaryClassifier(np.array([0., 1., 1., 0.]), 0.5)
+    HG = core.global_entropy(hc, cache=True)
+    assert cache.default_cache().directory == str(tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+    assert core.global_entropy(hc, cache=True) == HG
+
+
+def test_bad_cache():
+    """Test the cache must be a bool or a ResultCache."""
+    hc = classifier.BinaryClassifier(np.array([0., 1., 1., 0.]), 0.5)
+    with pytest.raises(TypeError):
+        core.global_entropy(hc, cache='yes')
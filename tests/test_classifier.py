@@ -4,6 +4,7 @@ import pytest
 import numpy as np
 import xarray as xr
 from entrogrammer import classifier
+from entrogrammer import tools
 
 xr_data = xr.DataArray(np.zeros((2, 2)), dims=("x", "y"))
 np_data = np.zeros((2, 2))
@@ -90,15 +91,6 @@ def test_override_threshold():
     assert np.all(C.classified[1, :] == 1)
 
 
-# check for jenkspy - skips test if jenkspy is not present
-_skip_jenks = 0
-try:
-    from jenkspy import JenksNaturalBreaks
-except Exception:
-    _skip_jenks = 1
-
-
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_int():
     """Test JenksClassifier with integer."""
     vals = np.zeros((5,))
@@ -109,7 +101,6 @@ def test_jenks_int():
     assert len(np.unique(C.classified)) == 2
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_int_2D():
     """Test JenksClassifier with integer."""
     vals = np.zeros((5, 5))
@@ -121,7 +112,6 @@ def test_jenks_int_2D():
     assert C.nb_class == 3
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_float():
     """Test JenksClassifier with float."""
     vals = np.zeros((5,))
@@ -133,7 +123,6 @@ def test_jenks_float():
     assert C.nb_class == 3
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_invalid_nbclass_at_init():
     """Test JenksClassifier with invalid input."""
     vals = np.zeros((5,))
@@ -142,7 +131,6 @@ def test_jenks_invalid_nbclass_at_init():
         classifier.JenksClassifier(vals, 'invalid')
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_invalid_nbclass_later_on():
     """Test JenksClassifier with invalid input."""
     vals = np.zeros((5,))
@@ -152,7 +140,6 @@ def test_jenks_invalid_nbclass_later_on():
         C.classify('invalid')
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_small_nbclass():
     """Test JenksClassifier with too small nb_class input."""
     vals = np.zeros((5,))
@@ -161,7 +148,6 @@ def test_jenks_small_nbclass():
         classifier.JenksClassifier(vals, 1)
 
 
-@pytest.mark.skipif(_skip_jenks == 1, reason="jenkspy not available")
 def test_jenks_big_nbclass():
     """Test JenksClassifier with too big nb_class input."""
     vals = np.zeros((5,))
@@ -170,6 +156,33 @@ def test_jenks_big_nbclass():
         classifier.JenksClassifier(vals, 6)
 
 
+def test_jenks_breaks_known():
+    """Test Jenks breaks on clearly separated groups."""
+    vals = np.array([1.0, 1.1, 1.2, 5.0, 5.1, 9.0, 9.2, 9.1])
+    C = classifier.JenksClassifier(vals, 3)
+    assert np.all(C.breaks == np.array([1.0, 1.2, 5.1, 9.2]))
+    assert np.all(C.classified == np.array([0, 0, 0, 1, 1, 2, 2, 2]))
+
+
+@pytest.mark.parametrize('sampling', ['random', 'stratified'])
+def test_jenks_sampled(sampling):
+    """Test Jenks breaks fit on a sample of the data."""
+    rng = np.random.default_rng(0)
+    vals = np.concatenate((rng.normal(0, 0.1, 5000),
+                           rng.normal(10, 0.1, 5000)))
+    C = classifier.JenksClassifier(vals, 2, sample_size=500,
+                                   sampling=sampling, random_state=1)
+    assert np.all(C.classified[:5000] == 0)
+    assert np.all(C.classified[5000:] == 1)
+
+
+def test_jenks_bad_sampling():
+    """Test Jenks with an unknown sampling mode."""
+    with pytest.raises(ValueError):
+        classifier.JenksClassifier(np.arange(10.0), 2, sample_size=5,
+                                   sampling='invalid')
+
+
 # tests for histogram-like binning
 def test_hist_int():
     """Test HistogramClassifier with integer."""
@@ -212,3 +225,164 @@ def test_hist_badrange():
     vals = np.zeros((10,))
     with pytest.raises(TypeError):
         classifier.HistogramClassifier(vals, bins=10.0, range='badrange')
+
+
+# tests for the label dtype
+def test_binary_uint8():
+    """Test binary labels are uint8 by default."""
+    C = classifier.BinaryClassifier(np.array([0.0, 1.0, 2.0]), 1.0)
+    assert C.classified.dtype == np.uint8
+    assert np.all(C.classified == np.array([0, 1, 1]))
+
+
+def test_hist_label_dtype():
+    """Test histogram labels use the smallest dtype holding them."""
+    vals = np.arange(1000.0)
+    assert classifier.HistogramClassifier(vals, 10).classified.dtype \
+        == np.uint8
+    assert classifier.HistogramClassifier(vals, 300).classified.dtype \
+        == np.uint16
+
+
+def test_explicit_dtype():
+    """Test setting the label dtype explicitly."""
+    C = classifier.BinaryClassifier(np_data, 1, dtype='int32')
+    assert C.classified.dtype == np.int32
+    with pytest.raises(TypeError):
+        classifier.BinaryClassifier(np_data, 1, dtype=float)
+    with pytest.raises(ValueError):
+        classifier.HistogramClassifier(np.arange(1000.0), 300, dtype='uint8')
+
+
+# tests for the label encoding
+def test_encode_codes_labels():
+    """Test dense codes and the code-to-label table."""
+    C = classifier.HistogramClassifier(np.array([0, 10, 20, 100]), 2)
+    assert np.all(C.codes == np.array([0, 0, 0, 1]))
+    assert np.all(C.labels == np.array([1, 3]))
+    assert C.n_class == 2
+    assert np.all(C.labels[C.codes] == C.classified)
+
+
+def test_encode_refreshed_on_classify():
+    """Test the encoding is redone after re-classifying."""
+    C = classifier.BinaryClassifier(np.array([0.0, 1.0]), 0.5)
+    assert C.n_class == 2
+    C.classify(5.0)
+    assert C.n_class == 1
+    assert np.all(C.codes == 0)
+
+
+# tests for fit / transform
+def test_transform_realizations():
+    """Test applying fitted parameters to other arrays."""
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=1000)
+    realizations = rng.normal(size=(5, 100))
+    for C in [classifier.BinaryClassifier(reference, 0.0),
+              classifier.HistogramClassifier(reference, 4),
+              classifier.JenksClassifier(reference, 3, sample_size=200)]:
+        out = np.zeros(realizations.shape, dtype=C.classified.dtype)
+        labels = C.transform(realizations, out=out)
+        assert labels is out
+        # same labels as classifying with the same parameters
+        assert np.all(labels.ravel() == C.transform(realizations.ravel()))
+    H = classifier.HistogramClassifier(reference, 4)
+    assert np.all(H.transform(realizations) ==
+                  np.digitize(realizations, H.bin_edges))
+
+
+def test_fit_on_sample():
+    """Test refitting on another sample leaves classified unchanged."""
+    C = classifier.HistogramClassifier(np.array([0.0, 1.0, 2.0, 4.0]), 2)
+    classified = C.classified.copy()
+    C.fit(np.array([0.0, 8.0]))
+    assert np.all(C.bin_edges == np.array([0.0, 4.0, 8.0]))
+    assert np.all(C.classified == classified)
+    assert np.all(C.transform(np.array([1.0, 5.0])) == np.array([1, 2]))
+
+
+def test_transform_bad_out():
+    """Test error with an output array of the wrong shape."""
+    C = classifier.BinaryClassifier(np_data, 1)
+    with pytest.raises(ValueError):
+        C.transform(np_data, out=np.zeros((3,), dtype=np.uint8))
+
+
+def test_classify_only_subclass():
+    """Test a subclass implementing only classify() still works."""
+    class SignClassifier(classifier.BaseClassifier):
+        def classify(self):
+            self.classified = (self._data > 0).astype(np.uint8)
+
+    sc = SignClassifier(np.array([-1.0, 2.0, 3.0]))
+    sc.classify()
+    assert np.all(sc.classified == np.array([0, 1, 1]))
+    assert sc.fit() is sc
+    with pytest.raises(NotImplementedError):
+        sc.transform(np.zeros(3))
+
+
+def test_memmap_classifier(tmp_path):
+    """Test memory-mapped and .npy inputs are labelled out of memory."""
+    data = np.random.default_rng(0).random((20, 10))
+    path = tmp_path / 'data.npy'
+    np.save(path, data)
+    hc = classifier.HistogramClassifier(str(path), bins=4)
+    assert isinstance(hc.data, np.memmap)
+    assert isinstance(hc.classified, np.memmap)
+    ref = classifier.HistogramClassifier(data, bins=4)
+    assert np.all(hc.classified == ref.classified)
+    assert np.all(hc.bin_edges == ref.bin_edges)
+    jc = classifier.JenksClassifier(np.load(path, mmap_mode='r'), 3)
+    assert isinstance(jc.classified, np.memmap)
+
+
+def test_memmap_jenks_sampling(tmp_path, monkeypatch):
+    """Test Jenks breaks of memory-mapped data are fit on a sample."""
+    data = np.random.default_rng(2).random(1000)
+    path = tmp_path / 'data.npy'
+    np.save(path, data)
+    monkeypatch.setattr(tools, 'JENKS_SAMPLE', 50)
+    fitted = []
+    jenks_breaks = tools.jenks_breaks
+
+    def spy(values, nb_class, sample_size, *args):
+        fitted.append(sample_size)
+        return jenks_breaks(values, nb_class, sample_size, *args)
+    monkeypatch.setattr(tools, 'jenks_breaks', spy)
+    classifier.JenksClassifier(np.load(path, mmap_mode='r'), 3)
+    assert fitted == [50]
+    with pytest.raises(ValueError):
+        classifier.JenksClassifier(np.load(path, mmap_mode='r'), 3,
+                                   sampling='stratified')
+
+
+def test_dask_classifier():
+    """Test classifiers label dask arrays lazily, block by block."""
+    da = pytest.importorskip('dask.array')
+    data = np.random.default_rng(1).random((30, 8))
+    lazy = da.from_array(data, chunks=(10, 4))
+    jc = classifier.JenksClassifier(lazy, 3, sample_size=100,
+                                    random_state=0)
+    assert isinstance(jc.classified, da.Array)
+    ref = np.searchsorted(jc.cuts, data)
+    assert np.all(jc.classified.compute() == ref)
+    bc = classifier.BinaryClassifier(lazy, 0.5)
+    assert np.all(bc.classified.compute() == (data >= 0.5))
+
+
+def test_dask_jenks_default_sample(monkeypatch):
+    """Test Jenks breaks of dask data are fit on a bounded sample."""
+    da = pytest.importorskip('dask.array')
+    data = np.random.default_rng(3).random((30, 8))
+    monkeypatch.setattr(tools, 'JENKS_SAMPLE', 40)
+    dask_sample = tools.dask_sample
+    sizes = []
+
+    def spy(array, sample_size=None, random_state=None):
+        sizes.append(sample_size)
+        return dask_sample(array, sample_size, random_state)
+    monkeypatch.setattr(tools, 'dask_sample', spy)
+    classifier.JenksClassifier(da.from_array(data, chunks=(10, 4)), 3)
+    assert sizes == [40]
@@ -5,6 +5,7 @@ import numpy as np
 from scipy.stats import entropy
 from entrogrammer import core
 from entrogrammer import classifier
+from entrogrammer import tools
 
 
 def test_type_error():
@@ -13,11 +14,21 @@ def test_type_error():
         core.global_entropy('invalid')
 
 
-def test_badbase_error():
+@pytest.mark.parametrize('base', [1, 0, -2, 'invalid'])
+def test_badbase_error(base):
     """Test that an error is raised if base is invalid."""
     C = classifier.BinaryClassifier(np.zeros(2), 1)
     with pytest.raises(TypeError):
-        core.global_entropy(C, 4)
+        core.global_entropy(C, base)
+
+
+def test_any_positive_base():
+    """Test local and global entropy with an arbitrary base."""
+    C = classifier.BinaryClassifier(np.array([0, 1, 1, 0]), 0.5)
+    HG = core.global_entropy(C, 4)
+    assert HG == pytest.approx(entropy((0.5, 0.5), base=4))
+    HL = core.local_entropy(C, 4, 4)
+    assert np.allclose(HL, HG)
 
 
 def test_entropy_zero():
@@ -27,6 +38,13 @@ def test_entropy_zero():
     assert HG == 0
 
 
+def test_entropy_class_counts():
+    """Test global entropy from merged class counts."""
+    counts = (tools.ClassCounts.from_array(np.array([0, 1])) +
+              tools.ClassCounts.from_array(np.array([1, 0])))
+    assert core.global_entropy(counts, 2) == 1
+
+
 def test_binary_entropy():
     """Test case where two options are equiprobable.
 
@@ -72,6 +90,31 @@ def test_1D_entrogram_windows():
     assert HR[1] == 1.0
 
 
+def test_1D_entrogram_scales():
+    """Test 1D entrogram at explicit scales."""
+    rng = np.random.default_rng(5)
+    C = classifier.BinaryClassifier(rng.random(50), 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    HR_s, win_s = core.calculate_entrogram(C, scales=[3, 10, 40])
+    assert win_s == [3, 10, 40]
+    assert np.allclose(HR_s, [HR[1], HR[8], HR[38]])
+
+
+def test_1D_entrogram_log_spacing():
+    """Test 1D entrogram with geometrically spaced scales."""
+    C = classifier.BinaryClassifier(np.random.default_rng(6).random(1000),
+                                    0.5)
+    HR, win_size = core.calculate_entrogram(C, spacing='log', n_scales=10)
+    assert win_size == [2, 4, 8, 16, 32, 63, 126, 251, 501, 1000]
+    assert len(HR) == 10
+    _, win_lin = core.calculate_entrogram(C, 2, 11, n_scales=4)
+    assert win_lin == [2, 5, 8, 11]
+    with pytest.raises(ValueError):
+        core.calculate_entrogram(C, spacing='log')
+    with pytest.raises(ValueError):
+        core.calculate_entrogram(C, spacing='invalid', n_scales=3)
+
+
 def test_1D_entrogram_invalid_minwin():
     """Test 1D entrogram with invalid min_win."""
     C = classifier.BinaryClassifier(np.array([0, 1, 0]), 0.5)
@@ -79,6 +122,24 @@ def test_1D_entrogram_invalid_minwin():
         core.calculate_entrogram(C, min_win='bad', max_win=3)
 
 
+@pytest.mark.parametrize('shape', [(8,), (8, 6)])
+@pytest.mark.parametrize('min_win', [0, -1])
+def test_entrogram_nonpositive_minwin(shape, min_win):
+    """Test window sizes below 1 are rejected by every entrogram."""
+    C = classifier.BinaryClassifier(np.random.default_rng(3).random(shape),
+                                    0.5)
+    with pytest.raises(ValueError):
+        core.calculate_entrogram(C, min_win=min_win, max_win=2)
+    with pytest.raises(ValueError):
+        core.calculate_entrogram_batch([C, C], min_win=min_win, max_win=2)
+    with pytest.raises(ValueError):
+        core.sample_entrogram(C, min_win=min_win, max_win=2)
+    with pytest.raises(ValueError):
+        core.find_entropic_scale(C, min_win=min_win)
+    with pytest.raises(ValueError):
+        core.calculate_entrogram(C, max_win=0, n_scales=3)
+
+
 def test_1D_entrogram_invalid_maxwin():
     """Test 1D entrogram with invalid max_win."""
     C = classifier.BinaryClassifier(np.array([0, 1, 0]), 0.5)
@@ -125,6 +186,16 @@ def test_local_entropy_1D_bad_win():
         core.local_entropy(C, ('invalid',))
 
 
+@pytest.mark.parametrize('scale', [0, -1, (0, 3), (-2,)])
+@pytest.mark.parametrize('shape', [(6,), (6, 5), (6, 5, 4)])
+def test_local_entropy_bad_scale(scale, shape):
+    """Test window sizes below 1 are rejected."""
+    C = classifier.BinaryClassifier(np.random.default_rng(4).random(shape),
+                                    0.5)
+    with pytest.raises(ValueError):
+        core.local_entropy(C, scale)
+
+
 def test_local_entropy_wrongwintype():
     """Test 1D local entropy calculation with invalid tuple type."""
     C = classifier.BinaryClassifier(np.array([0, 1, 0]), 0.5)
@@ -132,12 +203,103 @@ def test_local_entropy_wrongwintype():
         core.local_entropy(C, 'invalid')
 
 
-@pytest.mark.xfail(raises=NotImplementedError)
 def test_local_entropy_2D_tuple():
     """Test 2D local entropy calculation with tuple."""
     C = classifier.BinaryClassifier(np.zeros((2, 2)), 0.5)
     HL = core.local_entropy(C, (2, 2))
-    assert HL == 0
+    assert np.all(HL == 0)
+
+
+def test_local_entropy_2D_short_tuple():
+    """Test 2D local entropy with the last tuple value padded."""
+    vals = np.zeros((3, 4))
+    vals[:, 0] = 1
+    C = classifier.BinaryClassifier(vals, 0.5)
+    HL = core.local_entropy(C, (3,), 2)
+    # a single 3x3 window per column position
+    assert np.allclose(HL[:, 0], entropy((1/3, 2/3), base=2))
+    assert np.all(HL[:, 3] == 0)
+
+
+def test_2D_entrogram():
+    """Test 2D entrogram reaches the global entropy at full size."""
+    vals = np.zeros((4, 4))
+    vals[:2, :] = 1
+    C = classifier.BinaryClassifier(vals, 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    assert win_size == [2, 3, 4]
+    assert HR[-1] == pytest.approx(1.0)
+
+
+def test_3D_entrogram():
+    """Test 3D entrogram against the local entropy at each scale."""
+    rng = np.random.default_rng(0)
+    C = classifier.BinaryClassifier(rng.random((4, 5, 6)), 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    HG = core.global_entropy(C)
+    assert win_size == [2, 3, 4]
+    for i, w in enumerate(win_size):
+        assert HR[i] == pytest.approx(np.mean(core.local_entropy(C, w)) / HG)
+
+
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_parallel_entrogram(n_jobs):
+    """Test parallel entrogram gives the serial values."""
+    rng = np.random.default_rng(1)
+    C = classifier.BinaryClassifier(rng.random((12, 10)), 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    HR_par, win_par = core.calculate_entrogram(C, n_jobs=n_jobs)
+    assert win_par == win_size
+    assert np.allclose(HR_par, HR)
+    # single scale is split into tiles instead
+    HR_tile, _ = core.calculate_entrogram(C, 4, 4, n_jobs=n_jobs)
+    assert HR_tile[0] == pytest.approx(HR[2])
+
+
+@pytest.mark.parametrize('n_jobs', [0, -2, 'a'])
+def test_bad_jobs(n_jobs):
+    """Test n_jobs must be -1 or at least 1."""
+    C = classifier.BinaryClassifier(np.array([0., 1., 1., 0.]), 0.5)
+    with pytest.raises(ValueError):
+        core.calculate_entrogram(C, n_jobs=n_jobs)
+
+
+def test_parallel_entrogram_old_numba(monkeypatch):
+    """Test parallel entrogram without numba.set_parallel_chunksize."""
+    import numba
+    monkeypatch.delattr(numba, 'set_parallel_chunksize')
+    C = classifier.BinaryClassifier(
+        np.random.default_rng(1).random((12, 10)), 0.5)
+    HR, _ = core.calculate_entrogram(C)
+    assert np.allclose(core.calculate_entrogram(C, n_jobs=2)[0], HR)
+
+
+@pytest.mark.parametrize('shape', [(30,), (8, 9), (5, 6, 4)])
+def test_entrogram_batch(shape):
+    """Test batched entrogram against one entrogram per realization."""
+    rng = np.random.default_rng(2)
+    Cs = [classifier.BinaryClassifier(rng.random(shape), 0.5)
+          for _ in range(3)]
+    HR, win_size = core.calculate_entrogram_batch(Cs, n_jobs=2)
+    assert HR.shape == (3, len(win_size))
+    for i, C in enumerate(Cs):
+        HR_i, win_i = core.calculate_entrogram(C)
+        assert win_i == win_size
+        assert np.allclose(HR[i], HR_i)
+    # same from an array with the realizations along the first axis
+    HR_arr, _ = core.calculate_entrogram_batch(
+        np.stack([C.classified for C in Cs]))
+    assert np.allclose(HR_arr, HR)
+
+
+def test_entrogram_batch_bad_shapes():
+    """Test batched entrogram with realizations of different shapes."""
+    Cs = [classifier.BinaryClassifier(np.zeros(3), 0.5),
+          classifier.BinaryClassifier(np.zeros(4), 0.5)]
+    with pytest.raises(ValueError):
+        core.calculate_entrogram_batch(Cs)
+    with pytest.raises(TypeError):
+        core.calculate_entrogram_batch('invalid')
 
 
 def test_entropic_scale():
@@ -146,3 +308,204 @@ def test_entropic_scale():
     win_size = [10, 20, 30, 40, 50]
     ent_scale = core.calculate_entropic_scale(HR, win_size)
     assert ent_scale == 40
+
+
+@pytest.mark.parametrize('method', ['scan', 'bisect'])
+def test_find_entropic_scale(method):
+    """Test direct entropic scale search against the full entrogram."""
+    rng = np.random.default_rng(3)
+    C = classifier.BinaryClassifier(rng.random(60), 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    expected = core.calculate_entropic_scale(HR, win_size)
+    assert core.find_entropic_scale(C, method=method) == expected
+
+
+def test_find_entropic_scale_scan_stops():
+    """Test scan stops at the first scale reaching the global entropy."""
+    vals = np.tile(np.repeat([0.0, 1.0], 5), 10)
+    C = classifier.BinaryClassifier(vals, 0.5)
+    HR, win_size = core.calculate_entrogram(C)
+    expected = core.calculate_entropic_scale(HR, win_size)
+    assert core.find_entropic_scale(C) == expected
+
+
+def test_find_entropic_scale_bisect_evaluations(monkeypatch):
+    """Test bisection only evaluates a logarithmic number of scales."""
+    rng = np.random.default_rng(4)
+    C = classifier.BinaryClassifier(rng.random(500), 0.5)
+    calls = []
+    mean_HL = tools.mean_HL
+
+    def counted(*args):
+        calls.append(args[2])
+        return mean_HL(*args)
+
+    monkeypatch.setattr(tools, 'mean_HL', counted)
+    found = core.find_entropic_scale(C, method='bisect', tol=8)
+    assert len(calls) < 20
+    assert np.mean(core.local_entropy(C, found)) >= core.global_entropy(C)
+
+
+def test_find_entropic_scale_not_reached():
+    """Test error when the entropic scale is beyond max_win."""
+    C = classifier.BinaryClassifier(np.array([0, 0, 1, 1, 0, 1]), 0.5)
+    with pytest.raises(ValueError):
+        core.find_entropic_scale(C, max_win=2)
+    with pytest.raises(ValueError):
+        core.find_entropic_scale(C, method='invalid')
+
+
+def test_local_entropy_window_step():
+    """Test non-overlapping windows leave the trailing cells as nan."""
+    bc = classifier.BinaryClassifier(np.arange(10), 5)
+    bc.classify()
+    HL = core.local_entropy(bc, 3, step='window')
+    assert np.all(np.isnan(HL[9:]))
+    assert np.all(HL[:3] == 0)
+    assert np.all(HL[3:6] > 0)
+
+
+def test_entrogram_step():
+    """Test a strided entrogram is close to the dense one."""
+    rng = np.random.default_rng(3)
+    bc = classifier.BinaryClassifier(rng.random((30, 30)), 0.5)
+    bc.classify()
+    HR, win_size = core.calculate_entrogram(bc, max_win=10)
+    HR_step, _ = core.calculate_entrogram(bc, max_win=10, step=2)
+    assert win_size == list(range(2, 11))
+    assert np.allclose(HR, HR_step, atol=0.05)
+
+
+@pytest.mark.parametrize('step', [0, 'overlap', 2.5j])
+def test_bad_step(step):
+    """Test bad step values are rejected."""
+    bc = classifier.BinaryClassifier(np.arange(10), 5)
+    bc.classify()
+    with pytest.raises((TypeError, ValueError)):
+        core.local_entropy(bc, 3, step=step)
+
+
+def test_sample_entrogram():
+    """Test the sampled entrogram against the exact one."""
+    rng = np.random.default_rng(4)
+    bc = classifier.BinaryClassifier(rng.random((40, 40)), 0.5)
+    bc.classify()
+    HR, win_size = core.calculate_entrogram(bc, scales=[2, 5, 10])
+    HR_mc, HR_se, win_mc = core.sample_entrogram(bc, scales=[2, 5, 10],
+                                                 rtol=0.01, random_state=0)
+    assert win_mc == win_size
+    assert np.all(np.array(HR_se) <= 0.01 * np.array(HR_mc))
+    assert np.allclose(HR, HR_mc, rtol=0.05)
+
+
+@pytest.mark.parametrize('kwargs', [{'n_samples': 1}, {'n_samples': 'a'},
+                                    {'rtol': 0}, {'max_samples': 0}])
+def test_sample_entrogram_bad_args(kwargs):
+    """Test invalid sampling parameters are rejected."""
+    bc = classifier.BinaryClassifier(np.arange(10), 5)
+    bc.classify()
+    with pytest.raises(ValueError):
+        core.sample_entrogram(bc, **kwargs)
+
+
+def test_local_entropy_memmap(tmp_path):
+    """Test out-of-core local entropy written to a .npy file."""
+    data = np.random.default_rng(5).random((30, 12))
+    path = tmp_path / 'data.npy'
+    np.save(path, data)
+    bc = classifier.BinaryClassifier(str(path), 0.5)
+    ref = classifier.BinaryClassifier(data, 0.5)
+    HL = core.local_entropy(bc, 4, out=str(tmp_path / 'HL.npy'),
+                            chunk_size=7)
+    assert isinstance(HL, np.memmap)
+    assert np.allclose(HL, core.local_entropy(ref, 4))
+    assert np.allclose(np.load(tmp_path / 'HL.npy'), HL)
+    assert core.global_entropy(bc) == pytest.approx(core.global_entropy(ref))
+
+
+@pytest.mark.parametrize('shape', [(200,), (30, 24), (9, 8, 7)])
+def test_local_entropy_out_float32(shape):
+    """Test reusing an output buffer and float32 local entropy."""
+    data = np.random.default_rng(7).random(shape)
+    hc = classifier.HistogramClassifier(data, bins=3)
+    HL = core.local_entropy(hc, 4, step=2)
+    out = np.full(shape, -1.0)
+    assert core.local_entropy(hc, 4, step=2, out=out) is out
+    assert np.allclose(out, HL, equal_nan=True)
+    HL32 = core.local_entropy(hc, 4, step=2, dtype=np.float32)
+    assert HL32.dtype == np.float32
+    assert np.allclose(HL32, HL, equal_nan=True, atol=1e-6)
+    out = np.zeros(shape, dtype=np.float32)
+    assert core.local_entropy(hc, 3, out=out) is out
+    assert np.allclose(out, core.local_entropy(hc, 3), atol=1e-6)
+
+
+@pytest.mark.parametrize('kwargs', [{'dtype': int}, {'dtype': 'bad'},
+                                    {'dtype': np.float16},
+                                    {'dtype': np.longdouble},
+                                    {'out': np.zeros(10, dtype=int)},
+                                    {'out': np.zeros(10, dtype=np.float16)},
+                                    {'out': np.zeros(10,
+                                                     dtype=np.longdouble)}])
+def test_local_entropy_bad_out(kwargs):
+    """Test the output array and dtype must be float."""
+    bc = classifier.BinaryClassifier(np.random.default_rng(8).random(10),
+                                     0.5)
+    with pytest.raises(TypeError):
+        core.local_entropy(bc, 3, **kwargs)
+
+
+def test_local_entropy_out_shape():
+    """Test the output array must match the data."""
+    bc = classifier.BinaryClassifier(np.random.default_rng(8).random(10),
+                                     0.5)
+    with pytest.raises(ValueError):
+        core.local_entropy(bc, 3, out=np.zeros(9))
+
+
+def test_dask_lazy():
+    """Test dask-backed data stay lazy and match the in-memory results."""
+    da = pytest.importorskip('dask.array')
+    import xarray as xr
+    data = np.random.default_rng(6).random((24, 18))
+    lazy = xr.DataArray(da.from_array(data, chunks=(7, 5)))
+    hc = classifier.HistogramClassifier(lazy, bins=3)
+    ref = classifier.HistogramClassifier(data, bins=3)
+    assert tools.is_dask(hc.classified)
+    HL = core.local_entropy(hc, 4)
+    assert tools.is_dask(HL)
+    assert np.allclose(HL.compute(), core.local_entropy(ref, 4))
+    assert core.global_entropy(hc) == pytest.approx(core.global_entropy(ref))
+    stages = []
+    HR, win_size = core.calculate_entrogram(hc, scales=[2, 5], step=2,
+                                            callback=stages.append)
+    HR_ref, _ = core.calculate_entrogram(ref, scales=[2, 5], step=2)
+    assert np.allclose(HR, HR_ref)
+    assert [s['stage'] for s in stages] == ['check', 'compute']
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_entrogram_callback(n_jobs):
+    """Test the stages reported to the callback."""
+    rng = np.random.default_rng(7)
+    bc = classifier.BinaryClassifier(rng.random((20, 20)), 0.5)
+    events = []
+    HR, win_size = core.calculate_entrogram(bc, scales=[2, 5], n_jobs=n_jobs,
+                                            callback=events.append)
+    assert [e['stage'] for e in events] == ['check', 'encode', 'HG', 'table',
+                                            'compile', 'scale', 'scale']
+    assert all(e['time'] >= 0 for e in events)
+    assert events[-1]['windows'] == 16 * 16
+    assert events[-1]['win_size'] == (5, 5)
+    assert events[-1]['bytes'] > 0
+    assert HR == pytest.approx(core.calculate_entrogram(bc, scales=[2, 5])[0])
+
+
+def test_entrogram_cancel():
+    """Test returning True from the callback stops after that scale."""
+    rng = np.random.default_rng(8)
+    bc = classifier.BinaryClassifier(rng.random(50), 0.5)
+    HR, win_size = core.calculate_entrogram(
+        bc, callback=lambda e: e.get('index') == 2)
+    assert win_size == [2, 3, 4]
+    assert len(HR) == 3
@@ -0,0 +1,24 @@
+"""Unit tests for the package __init__.py."""
+
+import subprocess
+import sys
+import pytest
+import entrogrammer
+
+
+def test_lazy_submodules():
+    """Test importing the package does not load the heavy dependencies."""
+    code = ('import sys, entrogrammer; '
+            'print(sorted(m for m in ("matplotlib.pyplot", "scipy.stats", '
+            '"numba", "entrogrammer.core") if m in sys.modules))')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+
+def test_submodule_access():
+    """Test submodules are loaded on attribute access."""
+    assert entrogrammer.core.__name__ == 'entrogrammer.core'
+    assert 'tools' in dir(entrogrammer)
+    with pytest.raises(AttributeError):
+        entrogrammer.not_a_module